@@ -1,18 +1,27 @@
 import os
+import sys
 from app import create_app
 
 # Déterminer l'environnement
 env = os.environ.get('FLASK_ENV', 'dev')
 
-# Créer l'application
-app = create_app()
-
 if __name__ == '__main__':
     host = os.environ.get('HOST', '0.0.0.0')
     port = int(os.environ.get('PORT', 5000))
     
     print(f"=== API de Reconnaissance Faciale ===")
     print(f"Environnement: {env}")
+    
+    # Vérifié avant create_app: inutile de charger les modèles et la galerie pour quitter
+    if env == 'prod':
+        # Le serveur de développement ne traite qu'une requête à la fois
+        print("En production, lancer l'API avec gunicorn:")
+        print(f"  gunicorn -w $(nproc) --preload --worker-class gthread --threads 4 --timeout 120 -b {host}:{port} wsgi:application")
+        sys.exit(1)
+    
+    # Créer l'application
+    app = create_app()
+    
     print(f"Démarrage sur {host}:{port}")
     
-    app.run(host=host, port=port, debug=(env != 'prod'))
\ No newline at end of file
+    app.run(host=host, port=port, debug=True)
\ No newline at end of file
@@ -1,13 +1,43 @@
 from flask import Flask
 from flask_cors import CORS
 import os
+import numpy as np
 from app.config import Config
 
+def _warmup_models(app):
+    """
+    Initialiser une fois les modèles CPU pour éviter la latence de la première requête
+    
+    Avec gunicorn --preload, cette fonction s'exécute dans le processus maître avant le fork:
+    seuls les modèles sûrs après fork sont préparés ici. TensorFlow (modèle CNN) et les
+    contextes CUDA sont créés à la demande dans chaque worker.
+    """
+    import dlib
+    import face_recognition
+    
+    # Forcer l'initialisation du détecteur HOG (CPU)
+    dummy = np.zeros((32, 32, 3), dtype=np.uint8)
+    face_recognition.face_locations(dummy)
+    
+    # L'encodeur ResNet créerait un contexte CUDA si dlib est compilé avec CUDA
+    if not dlib.DLIB_USE_CUDA:
+        face_recognition.face_encodings(dummy, [(0, 32, 32, 0)])
+    
+    # Compiler les noyaux de correspondance Numba sans les exécuter
+    # (aucun pool de threads démarré avant le fork)
+    from app.services import match_numba
+    match_numba.warmup()
+
 def create_app(config_class=Config):
     """Factory pattern pour créer l'application Flask"""
     app = Flask(__name__)
     app.config.from_object(config_class)
     
+    # Extensions autorisées précalculées pour allowed_file
+    app.config['_ALLOWED_EXT_SET'] = frozenset(
+        ext.lower() for ext in app.config['ALLOWED_EXTENSIONS']
+    )
+    
     # Activer CORS
     CORS(app)
     
@@ -16,10 +46,15 @@ def create_app(config_class=Config):
     os.makedirs(app.config['KNOWN_FACES_FOLDER'], exist_ok=True)
     
     # Enregistrer les blueprints
-    from app.routes.face_routes import face_bp
+    from app.routes.face_routes import face_bp, initialize
     from app.routes.utils_routes import utils_bp
     
     app.register_blueprint(face_bp)
     app.register_blueprint(utils_bp)
     
+    # Charger les modèles et les visages au démarrage
+    with app.app_context():
+        _warmup_models(app)
+        initialize()
+    
     return app
\ No newline at end of file
@@ -13,6 +13,21 @@ class Config:
     # Paramètres de reconnaissance faciale
     FACE_RECOGNITION_THRESHOLD = 0.6  # Seuil de confiance pour la reconnaissance
     MODEL_COMPLEXITY = 1  # 0=moins précis mais plus rapide, 1=plus précis mais plus lent
+    USE_ONNX_DETECTOR = True  # Utiliser models/faceboxes.onnx à la place de HOG s'il est présent
+    FACE_ENCODING_MODEL = os.environ.get('FACE_ENCODING_MODEL', 'small')  # Points de repère: 'small' (5 points) ou 'large' (68 points)
+    FAST_HOG = True  # HOG par tables + image intégrale (False: cv2.HOGDescriptor)
+    # Lancer la détection HOG de repli en même temps que la méthode demandée
+    PARALLEL_FALLBACK_DETECTION = os.environ.get('PARALLEL_FALLBACK_DETECTION', 'false').lower() == 'true'
+    LOAD_WORKERS = int(os.environ.get('LOAD_WORKERS', 0))  # Processus d'encodage au chargement (0=tous les cœurs)
+    # Regroupement des encodages de requêtes concurrentes (utile avec des workers multi-threads)
+    MICRO_BATCHING = os.environ.get('MICRO_BATCHING', 'false').lower() == 'true'
+    BATCH_MAX_SIZE = 8  # Images par lot
+    DETECTION_BATCH_SIZE = 16  # Images par lot pour la détection CNN sur GPU
+    BATCH_MAX_WAIT_MS = 15  # Attente maximale pour compléter un lot
+    FAISS_HNSW_THRESHOLD = 5000  # Au-delà de ce nombre de visages, index HNSW approximatif
+    QUANTIZE_ENCODINGS = True  # Encodages en int8 (scalar quantizer FAISS, ou balayage Numba sans FAISS)
+    INT8_SCAN_THRESHOLD = 10000  # Sans FAISS, taille de galerie à partir de laquelle balayer en int8
+    MATCH_RERANK_K = 5  # Candidats de l'index réordonnés par distance exacte
 
 class DevelopmentConfig(Config):
     """Configuration de développement"""
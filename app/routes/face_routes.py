@@ -1,15 +1,13 @@
 from flask import Blueprint, request, jsonify, send_from_directory, current_app
-from app.services.face_service import register_face, delete_face, list_faces, load_known_faces
+from app.services.face_service import register_face, delete_face, list_faces, get_face, load_known_faces, get_names_etag
 from app.services.recognition_service import recognize_faces
 
 # Créer le blueprint
 face_bp = Blueprint('face', __name__)
 
-# Charger les visages au démarrage
-@face_bp.before_app_first_request
 def initialize():
-    """Initialiser les données au démarrage de l'application"""
-    count = load_known_faces()
+    """Initialiser les données au démarrage de l'application (appelé par create_app)"""
+    count = load_known_faces(startup=True)
     current_app.logger.info(f"{count} visages chargés au démarrage")
 
 @face_bp.route('/register_face', methods=['POST'])
@@ -79,6 +77,85 @@ def recognize_faces_route():
     result, status_code = recognize_faces(file, save_result)
     return jsonify(result), status_code
 
+@face_bp.route('/register_faces_batch', methods=['POST'])
+def register_faces_batch_route():
+    """
+    Enregistrer plusieurs visages en une seule requête
+    ---
+    tags:
+      - Faces
+    parameters:
+      - name: file
+        in: formData
+        type: file
+        required: true
+        description: Images contenant un visage (champ répété)
+      - name: name
+        in: formData
+        type: string
+        required: true
+        description: Noms des personnes, dans l'ordre des images (champ répété)
+    responses:
+      200:
+        description: Résultat de chaque enregistrement
+      400:
+        description: Erreur dans la requête
+    """
+    files = request.files.getlist('file')
+    names = request.form.getlist('name')
+    
+    if not files:
+        return jsonify({"success": False, "error": "Aucun fichier n'a été soumis"}), 400
+    if len(files) != len(names):
+        return jsonify({"success": False, "error": "Un nom est requis pour chaque image"}), 400
+    
+    results = []
+    for file, name in zip(files, names):
+        result, status_code = register_face(file, name)
+        results.append(dict(result, name=name, status=status_code))
+    
+    return jsonify({
+        "success": all(result['success'] for result in results),
+        "results": results,
+        "count": sum(result['success'] for result in results)
+    }), 200
+
+@face_bp.route('/recognize_batch', methods=['POST'])
+def recognize_batch_route():
+    """
+    Reconnaître les visages de plusieurs images en une seule requête
+    ---
+    tags:
+      - Faces
+    parameters:
+      - name: file
+        in: formData
+        type: file
+        required: true
+        description: Images à analyser (champ répété)
+    responses:
+      200:
+        description: Résultats de la reconnaissance pour chaque image
+      400:
+        description: Erreur dans la requête
+    """
+    files = request.files.getlist('file')
+    if not files:
+        return jsonify({"success": False, "error": "Aucun fichier n'a été soumis"}), 400
+    
+    # Option pour désactiver la sauvegarde des images (par défaut: activée)
+    save_result = request.form.get('save_result', 'true').lower() != 'false'
+    
+    results = []
+    for file in files:
+        result, status_code = recognize_faces(file, save_result)
+        results.append(dict(result, filename=file.filename, status=status_code))
+    
+    return jsonify({
+        "success": all(result['success'] for result in results),
+        "results": results
+    }), 200
+
 @face_bp.route('/get_image/<filename>')
 def get_image_route(filename):
     """
@@ -110,8 +187,37 @@ def list_faces_route():
     responses:
       200:
         description: Liste des visages connus
+      304:
+        description: Liste inchangée depuis l'ETag envoyé dans If-None-Match
     """
     result, status_code = list_faces()
+    
+    # ETag de la liste: le client réutilise sa copie tant que la galerie ne change pas
+    response = jsonify(result)
+    response.status_code = status_code
+    response.set_etag(get_names_etag(result['known_faces']))
+    return response.make_conditional(request)
+
+@face_bp.route('/face/<name>')
+def get_face_route(name):
+    """
+    Récupérer les informations d'un visage
+    ---
+    tags:
+      - Faces
+    parameters:
+      - name: name
+        in: path
+        type: string
+        required: true
+        description: Nom de la personne
+    responses:
+      200:
+        description: Informations du visage
+      404:
+        description: Visage non trouvé
+    """
+    result, status_code = get_face(name)
     return jsonify(result), status_code
 
 @face_bp.route('/delete_face/<name>')
@@ -0,0 +1,221 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+import dlib
+import face_recognition.api as face_api
+
+
+class _MicroBatcher:
+    """
+    File de requêtes vidée par un thread de fond, par lots de taille max_batch
+    ou après max_wait secondes; les sous-classes implémentent _process
+    """
+
+    def __init__(self, max_batch=8, max_wait=0.015):
+        """
+        Initialiser le regroupeur
+
+        Args:
+            max_batch: Nombre maximal d'éléments par lot
+            max_wait: Attente maximale (secondes) pour compléter un lot
+        """
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """Boucle du thread de fond"""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            try:
+                self._process(batch)
+            except Exception as e:
+                for item in batch:
+                    if not item[-1].done():
+                        item[-1].set_exception(e)
+
+    def _process(self, batch):
+        """
+        Traiter un lot; chaque élément se termine par son Future
+
+        Args:
+            batch: Liste de tuples (..., future)
+        """
+        raise NotImplementedError
+
+
+class FaceEncodingBatcher(_MicroBatcher):
+    """
+    Regroupe les encodages ResNet de requêtes concurrentes en un seul appel dlib
+    """
+
+    def __init__(self, max_batch=8, max_wait=0.015, num_jitters=1):
+        """
+        Initialiser le regroupeur
+
+        Args:
+            max_batch: Nombre maximal d'images par lot
+            max_wait: Attente maximale (secondes) pour compléter un lot
+            num_jitters: Nombre de ré-échantillonnages par visage
+        """
+        self.num_jitters = num_jitters
+        super().__init__(max_batch, max_wait)
+
+    def submit(self, image, face_locations, model='large'):
+        """
+        Demander l'encodage des visages d'une image
+
+        Args:
+            image: Image au format numpy array RGB
+            face_locations: Liste de rectangles (top, right, bottom, left)
+            model: Modèle de points de repère ('small' ou 'large')
+
+        Returns:
+            Future résolu avec la liste des encodages (np.ndarray (128,))
+        """
+        future = Future()
+        if not face_locations:
+            future.set_result([])
+            return future
+
+        # Les points de repère sont calculés dans le thread appelant
+        detections = dlib.full_object_detections()
+        detections.extend(face_api._raw_face_landmarks(image, face_locations, model=model))
+        self._queue.put((image, detections, future))
+        return future
+
+    def encode(self, image, face_locations, model='large'):
+        """Version bloquante de submit"""
+        return self.submit(image, face_locations, model).result()
+
+    def _process(self, batch):
+        """
+        Encoder un lot d'images en un seul appel au réseau
+
+        Args:
+            batch: Liste de tuples (image, détections, future)
+        """
+        images = [image for image, _, _ in batch]
+        detections = [dets for _, dets, _ in batch]
+
+        descriptors = face_api.face_encoder.compute_face_descriptor(
+            images, detections, self.num_jitters
+        )
+
+        for (_, _, future), faces in zip(batch, descriptors):
+            future.set_result([np.array(face) for face in faces])
+
+
+class FaceDetectionBatcher(_MicroBatcher):
+    """
+    Regroupe les détections CNN (dlib CUDA) de requêtes concurrentes
+    via face_recognition.batch_face_locations
+    """
+
+    def __init__(self, max_batch=16, max_wait=0.010, number_of_times_to_upsample=1):
+        """
+        Initialiser le regroupeur
+
+        Args:
+            max_batch: Nombre maximal d'images par lot
+            max_wait: Attente maximale (secondes) pour compléter un lot
+            number_of_times_to_upsample: Suréchantillonnages pour les petits visages
+        """
+        self.number_of_times_to_upsample = number_of_times_to_upsample
+        super().__init__(max_batch, max_wait)
+
+    def detect(self, image):
+        """
+        Détecter les visages d'une image (bloquant)
+
+        Args:
+            image: Image au format numpy array RGB
+
+        Returns:
+            Liste de rectangles (top, right, bottom, left)
+        """
+        future = Future()
+        self._queue.put((image, future))
+        return future.result()
+
+    def _process(self, batch):
+        """
+        Détecter les visages d'un lot; dlib exige des images de même taille
+        dans un appel, le lot est donc découpé par forme
+
+        Args:
+            batch: Liste de tuples (image, future)
+        """
+        groups = {}
+        for image, future in batch:
+            groups.setdefault(image.shape, []).append((image, future))
+
+        for items in groups.values():
+            locations = face_api.batch_face_locations(
+                [image for image, _ in items],
+                number_of_times_to_upsample=self.number_of_times_to_upsample,
+                batch_size=len(items),
+            )
+            for (_, future), faces in zip(items, locations):
+                future.set_result(faces)
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def _get(cls, max_batch, max_wait):
+    """
+    Retourner le regroupeur du processus pour une classe (créé au premier appel,
+    donc après le fork des workers gunicorn)
+    """
+    batcher = _batchers.get(cls)
+    if batcher is None:
+        with _batchers_lock:
+            batcher = _batchers.get(cls)
+            if batcher is None:
+                batcher = _batchers[cls] = cls(max_batch, max_wait)
+    return batcher
+
+
+def get_batcher(max_batch=8, max_wait=0.015):
+    """
+    Retourner le regroupeur d'encodages du processus
+
+    Args:
+        max_batch: Nombre maximal d'images par lot
+        max_wait: Attente maximale (secondes) pour compléter un lot
+
+    Returns:
+        FaceEncodingBatcher
+    """
+    return _get(FaceEncodingBatcher, max_batch, max_wait)
+
+
+def get_detection_batcher(max_batch=16, max_wait=0.010):
+    """
+    Retourner le regroupeur de détections CNN du processus
+
+    Args:
+        max_batch: Nombre maximal d'images par lot
+        max_wait: Attente maximale (secondes) pour compléter un lot
+
+    Returns:
+        FaceDetectionBatcher
+    """
+    return _get(FaceDetectionBatcher, max_batch, max_wait)
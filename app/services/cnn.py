@@ -1,12 +1,53 @@
 import os
+import shutil
+import threading
 import numpy as np
 import cv2
 import tensorflow as tf
 from tensorflow.keras import layers, models, optimizers
 from tensorflow.keras.applications import MobileNetV2
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from flask import current_app
-import pickle
+import json
+
+try:
+    import onnxruntime as ort
+    from onnxruntime.quantization import quantize_static, CalibrationDataReader, QuantFormat, QuantType
+except ImportError:  # onnxruntime est optionnel, inférence Keras par défaut
+    ort = None
+    CalibrationDataReader = object
+
+try:
+    import tf2onnx
+except ImportError:  # tf2onnx est optionnel, pas de modèle quantifié
+    tf2onnx = None
+
+# Ne pas réserver toute la mémoire GPU au démarrage du processus
+_GPUS = tf.config.list_physical_devices('GPU')
+for _gpu in _GPUS:
+    try:
+        tf.config.experimental.set_memory_growth(_gpu, True)
+    except RuntimeError:  # GPU déjà initialisé
+        pass
+
+
+def _has_entries(folder):
+    """Indiquer si un dossier contient au moins une entrée, sans le lister entièrement"""
+    with os.scandir(folder) as it:
+        return next(it, None) is not None
+
+
+class _CalibrationReader(CalibrationDataReader):
+    """Fournit des images représentatives pour la quantification statique"""
+    
+    def __init__(self, input_name, samples):
+        self.input_name = input_name
+        self._samples = iter(samples)
+    
+    def get_next(self):
+        sample = next(self._samples, None)
+        if sample is None:
+            return None
+        return {self.input_name: sample}
 
 class CNNFaceModel:
     """
@@ -14,6 +55,9 @@ class CNNFaceModel:
     Utilise une architecture basée sur MobileNetV2 (transfer learning)
     """
     
+    # Nombre de variantes augmentées vues par image et par époque
+    AUGMENTATIONS_PER_IMAGE = 10
+    
     def __init__(self):
         """Initialisation du modèle CNN"""
         self.model = None
@@ -25,11 +69,28 @@ class CNNFaceModel:
         os.makedirs(self.model_path, exist_ok=True)
         
         # Chemins pour sauvegarder/charger le modèle
-        self.model_file = os.path.join(self.model_path, 'face_recognition_model.h5')
-        self.labels_file = os.path.join(self.model_path, 'face_labels.pkl')
+        self.model_file = os.path.join(self.model_path, 'face_recognition_model.keras')
+        self.labels_file = os.path.join(self.model_path, 'face_labels.json')
+        self.onnx_file = os.path.join(self.model_path, 'face_recognition_model.onnx')
+        self.quantized_file = os.path.join(self.model_path, 'face_recognition_model.int8.onnx')
+        
+        # Tampons de prétraitement réutilisés (un jeu par thread)
+        self._local = threading.local()
+        
+        # Session ONNX Runtime sur le modèle quantifié int8 (si disponible)
+        self._ort_session = None
+        
+        # Périphérique d'exécution: GPU si disponible
+        self._device = '/GPU:0' if _GPUS else '/CPU:0'
+        
+        # Fonction d'inférence compilée (construite après chargement/entraînement)
+        self._infer = None
+        self._in = None
+        self._infer_lock = threading.Lock()
         
         # Essayer de charger un modèle existant
-        self._load_model()
+        if self._load_model():
+            self._build_infer()
     
     def _create_model(self, num_classes):
         """
@@ -41,32 +102,33 @@ class CNNFaceModel:
         Returns:
             Model Keras configuré
         """
-        # Utiliser MobileNetV2 comme base (efficace et léger)
-        base_model = MobileNetV2(
-            input_shape=(224, 224, 3),
-            include_top=False,
-            weights='imagenet'
-        )
-        
-        # Geler les couches du modèle de base
-        base_model.trainable = False
-        
-        # Construire le modèle complet
-        model = models.Sequential([
-            base_model,
-            layers.GlobalAveragePooling2D(),
-            layers.Dropout(0.5),
-            layers.Dense(512, activation='relu'),
-            layers.Dropout(0.3),
-            layers.Dense(num_classes, activation='softmax')
-        ])
-        
-        # Compiler le modèle
-        model.compile(
-            optimizer=optimizers.Adam(learning_rate=0.001),
-            loss='categorical_crossentropy',
-            metrics=['accuracy']
-        )
+        with tf.device(self._device):
+            # Utiliser MobileNetV2 comme base (efficace et léger)
+            base_model = MobileNetV2(
+                input_shape=(224, 224, 3),
+                include_top=False,
+                weights='imagenet'
+            )
+            
+            # Geler les couches du modèle de base
+            base_model.trainable = False
+            
+            # Construire le modèle complet
+            model = models.Sequential([
+                base_model,
+                layers.GlobalAveragePooling2D(),
+                layers.Dropout(0.5),
+                layers.Dense(512, activation='relu'),
+                layers.Dropout(0.3),
+                layers.Dense(num_classes, activation='softmax')
+            ])
+            
+            # Compiler le modèle
+            model.compile(
+                optimizer=optimizers.Adam(learning_rate=0.001),
+                loss='categorical_crossentropy',
+                metrics=['accuracy']
+            )
         
         return model
     
@@ -83,11 +145,14 @@ class CNNFaceModel:
                 self.model = models.load_model(self.model_file)
                 
                 # Charger les labels
-                with open(self.labels_file, 'rb') as f:
-                    self.face_labels = pickle.load(f)
+                with open(self.labels_file, 'r', encoding='utf-8') as f:
+                    self.face_labels = json.load(f)
                 
                 self.is_trained = True
                 current_app.logger.info(f"Modèle CNN chargé avec {len(self.face_labels)} personnes")
+                
+                # Charger la version quantifiée si elle existe
+                self._load_quantized_model()
                 return True
         except Exception as e:
             current_app.logger.error(f"Erreur lors du chargement du modèle CNN: {str(e)}")
@@ -103,8 +168,8 @@ class CNNFaceModel:
                 self.model.save(self.model_file)
                 
                 # Sauvegarder les labels
-                with open(self.labels_file, 'wb') as f:
-                    pickle.dump(self.face_labels, f)
+                with open(self.labels_file, 'w', encoding='utf-8') as f:
+                    json.dump(self.face_labels, f, ensure_ascii=False)
                 
                 current_app.logger.info(f"Modèle CNN sauvegardé avec {len(self.face_labels)} personnes")
                 return True
@@ -113,33 +178,156 @@ class CNNFaceModel:
         
         return False
     
-    def _preprocess_image(self, image):
+    def _build_infer(self):
+        """
+        Compiler le passage avant une seule fois pour la forme fixe (1, 224, 224, 3)
+        L'entrée est une variable persistante: pas de retraçage ni de nouveau tampon par appel
+        """
+        model = self.model
+        with tf.device(self._device):
+            self._in = tf.Variable(tf.zeros((1, 224, 224, 3), dtype=tf.float32), trainable=False)
+        inputs = self._in
+        
+        self._infer = tf.function(lambda: model(inputs, training=False), jit_compile=True, input_signature=[])
+        try:
+            with tf.device(self._device):
+                self._infer()
+        except Exception as e:
+            current_app.logger.warning(f"Compilation XLA impossible, inférence Keras directe: {str(e)}")
+            self._infer = tf.function(lambda: model(inputs, training=False), input_signature=[])
+    
+    def _load_quantized_model(self):
+        """
+        Ouvrir le modèle int8 avec ONNX Runtime
+        
+        Returns:
+            bool: True si la session a été créée, False sinon
+        """
+        self._ort_session = None
+        if ort is None or not os.path.exists(self.quantized_file):
+            return False
+        
+        try:
+            sess_options = ort.SessionOptions()
+            sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            self._ort_session = ort.InferenceSession(
+                self.quantized_file, sess_options, providers=['CPUExecutionProvider']
+            )
+            current_app.logger.info("Modèle CNN quantifié int8 chargé")
+            return True
+        except Exception as e:
+            current_app.logger.error(f"Erreur lors du chargement du modèle quantifié: {str(e)}")
+            return False
+    
+    def _quantize_model(self, train_dir, num_samples=100):
+        """
+        Exporter le modèle en ONNX puis le quantifier en int8 (QDQ)
+        
+        Args:
+            train_dir: Dossier des images d'entraînement (données de calibration)
+            num_samples: Nombre maximal d'images de calibration
+            
+        Returns:
+            bool: True si la quantification a réussi, False sinon
+        """
+        # Un modèle quantifié obsolète ne doit jamais survivre à un réentraînement
+        for path in (self.onnx_file, self.quantized_file):
+            if os.path.exists(path):
+                os.remove(path)
+        self._ort_session = None
+        
+        if ort is None or tf2onnx is None or self.model is None:
+            return False
+        
+        try:
+            spec = (tf.TensorSpec((None, 224, 224, 3), tf.float32, name='input'),)
+            tf2onnx.convert.from_keras(self.model, input_signature=spec, opset=13, output_path=self.onnx_file)
+            
+            # Échantillonner des images représentatives
+            samples = []
+            with os.scandir(train_dir) as it:
+                person_dirs = sorted(entry.path for entry in it if entry.is_dir())
+            for person_path in person_dirs:
+                with os.scandir(person_path) as it:
+                    image_paths = sorted(entry.path for entry in it if entry.is_file())
+                for image_path in image_paths:
+                    image = cv2.imread(image_path)
+                    if image is not None:
+                        samples.append(self._preprocess_image(image).copy())
+                    if len(samples) >= num_samples:
+                        break
+                if len(samples) >= num_samples:
+                    break
+            
+            quantize_static(
+                self.onnx_file,
+                self.quantized_file,
+                _CalibrationReader('input', samples),
+                quant_format=QuantFormat.QDQ,
+                activation_type=QuantType.QInt8,
+                weight_type=QuantType.QInt8
+            )
+            
+            current_app.logger.info("Modèle CNN quantifié en int8")
+            return self._load_quantized_model()
+        except Exception as e:
+            current_app.logger.error(f"Erreur lors de la quantification du modèle CNN: {str(e)}")
+            return False
+    
+    def _buffers(self):
+        """
+        Retourner les tampons de prétraitement du thread courant
+        Le modèle est partagé entre les requêtes: un jeu de tampons par thread
+        
+        Returns:
+            Tuple (tampon uint8 (224, 224, 3), tenseur float32 (1, 224, 224, 3))
+        """
+        local = self._local
+        if not hasattr(local, 'buf'):
+            local.tmp_u8 = np.empty((224, 224, 3), dtype=np.uint8)
+            local.buf = np.empty((1, 224, 224, 3), dtype=np.float32)
+        return local.tmp_u8, local.buf
+    
+    def _preprocess_image(self, image, is_bgr=True):
         """
         Prétraiter une image pour l'entrée du modèle
         
         Args:
-            image: Image numpy array au format BGR (OpenCV)
+            image: Image numpy array
+            is_bgr: True si l'image est au format BGR (OpenCV), False si RGB
             
         Returns:
-            Image prétraitée au format approprié pour le modèle
+            Image prétraitée (1, 224, 224, 3), réutilisée à l'appel suivant du même thread
         """
-        # Convertir BGR en RGB si nécessaire
-        if image.shape[2] == 3 and image[0,0,0] != image[0,0,2]:
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        tmp_u8, buf = self._buffers()
         
-        # Redimensionner à la taille attendue par le modèle
-        image = cv2.resize(image, (224, 224))
+        # Redimensionner d'abord pour que la conversion porte sur moins de pixels
+        cv2.resize(image, (224, 224), dst=tmp_u8)
         
-        # Normaliser les valeurs des pixels
-        image = image.astype(np.float32) / 255.0
+        # Convertir BGR en RGB
+        if is_bgr:
+            cv2.cvtColor(tmp_u8, cv2.COLOR_BGR2RGB, dst=tmp_u8)
         
-        # Prétraitement spécifique à MobileNetV2
-        image = tf.keras.applications.mobilenet_v2.preprocess_input(image)
+        # Mise à l'échelle [-1, 1] de MobileNetV2 directement dans le tenseur d'entrée
+        np.divide(tmp_u8, 127.5, out=buf[0], casting='unsafe')
+        buf -= 1.0
         
-        # Ajouter la dimension du lot (batch)
-        image = np.expand_dims(image, axis=0)
+        return buf
+    
+    def _build_augmentation(self):
+        """
+        Construire les couches d'augmentation exécutées dans le graphe TensorFlow
         
-        return image
+        Returns:
+            tf.keras.Sequential appliquant les transformations aléatoires
+        """
+        return tf.keras.Sequential([
+            layers.RandomFlip('horizontal'),
+            layers.RandomRotation(15 / 360, fill_mode='nearest'),
+            layers.RandomTranslation(0.2, 0.2, fill_mode='nearest'),
+            layers.RandomZoom(0.2, fill_mode='nearest'),
+            layers.RandomBrightness(0.3, value_range=(-1.0, 1.0)),
+        ])
     
     def train(self, known_faces_folder, epochs=10, batch_size=32):
         """
@@ -155,7 +343,7 @@ class CNNFaceModel:
         """
         try:
             # Vérifier si des visages existent
-            if not os.path.exists(known_faces_folder) or len(os.listdir(known_faces_folder)) == 0:
+            if not os.path.isdir(known_faces_folder) or not _has_entries(known_faces_folder):
                 current_app.logger.warning("Aucun visage trouvé pour l'entraînement")
                 return False
             
@@ -167,84 +355,73 @@ class CNNFaceModel:
             os.makedirs(train_dir, exist_ok=True)
             
             # Nettoyer les anciennes données
-            for person_dir in os.listdir(train_dir):
-                person_path = os.path.join(train_dir, person_dir)
-                if os.path.isdir(person_path):
-                    for file in os.listdir(person_path):
-                        os.remove(os.path.join(person_path, file))
-                    os.rmdir(person_path)
+            with os.scandir(train_dir) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        shutil.rmtree(entry.path, ignore_errors=True)
             
-            # Scanner le dossier des visages connus
+            # Scanner le dossier des visages connus (trié pour un ordre de classes stable)
             self.face_labels = []
-            for filename in os.listdir(known_faces_folder):
-                if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                    # Extraire le nom de la personne du nom de fichier
-                    person_name = os.path.splitext(filename)[0]
+            with os.scandir(known_faces_folder) as it:
+                image_entries = sorted(
+                    (entry for entry in it
+                     if entry.is_file() and entry.name.lower().endswith(('.png', '.jpg', '.jpeg'))),
+                    key=lambda entry: entry.name
+                )
+            for entry in image_entries:
+                # Extraire le nom de la personne du nom de fichier
+                person_name = os.path.splitext(entry.name)[0]
+                
+                if person_name not in self.face_labels:
+                    self.face_labels.append(person_name)
+                    
+                    # Créer un dossier pour cette personne
+                    person_dir = os.path.join(train_dir, person_name)
+                    os.makedirs(person_dir, exist_ok=True)
                     
-                    if person_name not in self.face_labels:
-                        self.face_labels.append(person_name)
-                        
-                        # Créer un dossier pour cette personne
-                        person_dir = os.path.join(train_dir, person_name)
-                        os.makedirs(person_dir, exist_ok=True)
-                        
-                        # Copier et augmenter l'image pour l'entraînement
-                        image_path = os.path.join(known_faces_folder, filename)
-                        image = cv2.imread(image_path)
-                        
-                        if image is not None:
-                            # Enregistrer l'image originale
-                            cv2.imwrite(os.path.join(person_dir, 'original.jpg'), image)
-                            
-                            # Générer des versions augmentées
-                            for i in range(10):  # Créer 10 variations
-                                # Rotation aléatoire
-                                angle = np.random.uniform(-15, 15)
-                                rows, cols = image.shape[:2]
-                                M = cv2.getRotationMatrix2D((cols/2, rows/2), angle, 1)
-                                rotated = cv2.warpAffine(image, M, (cols, rows))
-                                
-                                # Ajustement aléatoire de luminosité
-                                brightness = np.random.uniform(0.7, 1.3)
-                                adjusted = cv2.convertScaleAbs(rotated, alpha=brightness, beta=0)
-                                
-                                # Enregistrer l'image augmentée
-                                cv2.imwrite(os.path.join(person_dir, f'aug_{i}.jpg'), adjusted)
+                    # Copier l'image pour l'entraînement
+                    # (l'augmentation est faite en mémoire par le pipeline tf.data)
+                    image = cv2.imread(entry.path)
+                    
+                    if image is not None:
+                        cv2.imwrite(os.path.join(person_dir, 'original.jpg'), image)
             
             # S'il n'y a pas assez de personnes, impossible d'entraîner
             if len(self.face_labels) < 2:
                 current_app.logger.warning("Il faut au moins 2 personnes pour entraîner le modèle CNN")
                 return False
             
-            # Créer le générateur de données avec augmentation
-            train_datagen = ImageDataGenerator(
-                rescale=1./255,
-                rotation_range=20,
-                width_shift_range=0.2,
-                height_shift_range=0.2,
-                shear_range=0.2,
-                zoom_range=0.2,
-                horizontal_flip=True,
-                fill_mode='nearest',
-                validation_split=0.2  # 20% des données pour la validation
-            )
-            
-            # Générateur pour l'ensemble d'entraînement
-            train_generator = train_datagen.flow_from_directory(
+            # Charger les images une seule fois; l'ordre des classes suit face_labels
+            base_ds = tf.keras.utils.image_dataset_from_directory(
                 train_dir,
-                target_size=(224, 224),
-                batch_size=batch_size,
-                class_mode='categorical',
-                subset='training'
-            )
+                labels='inferred',
+                label_mode='categorical',
+                class_names=self.face_labels,
+                image_size=(224, 224),
+                batch_size=None,
+                shuffle=False
+            ).cache()
             
-            # Générateur pour l'ensemble de validation
-            validation_generator = train_datagen.flow_from_directory(
-                train_dir,
-                target_size=(224, 224),
-                batch_size=batch_size,
-                class_mode='categorical',
-                subset='validation'
+            augment = self._build_augmentation()
+            
+            def augment_fn(image, label):
+                # Même mise à l'échelle [-1, 1] que _preprocess_image
+                return augment(image / 127.5 - 1.0, training=True), label
+            
+            # Chaque époque voit plusieurs variantes aléatoires de chaque visage.
+            # L'augmentation est appliquée par lot (une opération vectorisée par lot
+            # plutôt qu'une par image), en parallèle et sans imposer l'ordre
+            train_ds = (
+                base_ds.repeat(self.AUGMENTATIONS_PER_IMAGE)
+                .shuffle(1024)
+                .batch(batch_size)
+                .map(augment_fn, num_parallel_calls=tf.data.AUTOTUNE, deterministic=False)
+                .prefetch(tf.data.AUTOTUNE)
+            )
+            val_ds = (
+                base_ds.batch(batch_size)
+                .map(augment_fn, num_parallel_calls=tf.data.AUTOTUNE, deterministic=False)
+                .prefetch(tf.data.AUTOTUNE)
             )
             
             # Créer le modèle avec le bon nombre de classes
@@ -252,15 +429,17 @@ class CNNFaceModel:
             
             # Entraîner le modèle
             self.model.fit(
-                train_generator,
-                steps_per_epoch=train_generator.samples // batch_size,
-                validation_data=validation_generator,
-                validation_steps=validation_generator.samples // batch_size,
+                train_ds,
+                validation_data=val_ds,
                 epochs=epochs
             )
             
             # Sauvegarder le modèle
             self._save_model()
+            self._build_infer()
+            
+            # Produire la version int8 pour l'inférence
+            self._quantize_model(train_dir)
             
             self.is_trained = True
             current_app.logger.info(f"Modèle CNN entraîné avec succès sur {len(self.face_labels)} personnes")
@@ -271,12 +450,13 @@ class CNNFaceModel:
             current_app.logger.error(f"Erreur lors de l'entraînement du modèle CNN: {str(e)}")
             return False
     
-    def predict(self, face_image):
+    def predict(self, face_image, is_bgr=True):
         """
         Prédire l'identité d'un visage
         
         Args:
             face_image: Image du visage (numpy array)
+            is_bgr: True si l'image est au format BGR (OpenCV), False si RGB
             
         Returns:
             Tuple (nom prédit, score de confiance) ou (None, 0) si pas de prédiction
@@ -286,10 +466,17 @@ class CNNFaceModel:
         
         try:
             # Prétraiter l'image
-            processed_image = self._preprocess_image(face_image)
+            processed_image = self._preprocess_image(face_image, is_bgr)
             
-            # Faire la prédiction
-            predictions = self.model.predict(processed_image)[0]
+            # Faire la prédiction (modèle int8 en priorité)
+            if self._ort_session is not None:
+                input_name = self._ort_session.get_inputs()[0].name
+                predictions = self._ort_session.run(None, {input_name: processed_image})[0][0]
+            else:
+                # La variable d'entrée est partagée entre les threads
+                with self._infer_lock, tf.device(self._device):
+                    self._in.assign(processed_image)
+                    predictions = self._infer().numpy()[0]
             
             # Trouver la classe avec la plus haute probabilité
             best_index = np.argmax(predictions)
@@ -0,0 +1,194 @@
+import os
+import hashlib
+import numpy as np
+from flask import current_app
+
+# Nom du fichier de cache stocké dans le dossier des visages connus
+CACHE_FILENAME = 'encodings.npz'
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """
+    Calculer l'empreinte SHA-256 d'un fichier
+
+    Args:
+        path: Chemin du fichier
+        chunk_size: Taille des blocs lus
+
+    Returns:
+        str: Empreinte hexadécimale
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class EncodingCache:
+    """
+    Cache disque des encodages faciaux
+    Évite de relancer le modèle dlib sur les images inchangées
+    """
+
+    def __init__(self, folder, model='large'):
+        """
+        Initialiser le cache pour un dossier de visages
+
+        Args:
+            folder: Dossier contenant les images de visages connus
+            model: Modèle de points de repère utilisé pour les encodages
+        """
+        self.path = os.path.join(folder, CACHE_FILENAME)
+        self.model = model
+        # filename -> (mtime_ns, size, sha256, encoding)
+        self._entries = {}
+        # sha256 -> encoding
+        self._by_hash = {}
+        self._dirty = False
+
+    def load(self):
+        """
+        Charger le cache depuis le disque s'il existe
+
+        Returns:
+            int: Nombre d'encodages chargés
+        """
+        self._entries = {}
+        self._by_hash = {}
+        self._dirty = False
+
+        if not os.path.exists(self.path):
+            return 0
+
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                # Les caches sans modèle enregistré datent du modèle 'large'
+                model = str(data['model']) if 'model' in data.files else 'large'
+                if model != self.model:
+                    current_app.logger.info(
+                        f"Cache d'encodages calculé avec le modèle '{model}', reconstruction"
+                    )
+                    self._dirty = True
+                    return 0
+                filenames = data['filenames']
+                mtimes = data['mtimes']
+                sizes = data['sizes']
+                hashes = data['hashes']
+                encodings = data['encodings']
+
+            for filename, mtime, size, sha, encoding in zip(filenames, mtimes, sizes, hashes, encodings):
+                sha = str(sha)
+                self._entries[str(filename)] = (int(mtime), int(size), sha, encoding)
+                self._by_hash[sha] = encoding
+        except Exception as e:
+            current_app.logger.warning(f"Cache d'encodages illisible, reconstruction: {str(e)}")
+            self._entries = {}
+            self._by_hash = {}
+
+        return len(self._entries)
+
+    def get(self, path, stat=None):
+        """
+        Retrouver l'encodage d'un fichier s'il n'a pas changé
+
+        Args:
+            path: Chemin du fichier image
+            stat: Résultat de os.stat déjà disponible (optionnel)
+
+        Returns:
+            Tuple (encoding ou None, sha256 ou None)
+        """
+        filename = os.path.basename(path)
+        if stat is None:
+            stat = os.stat(path)
+        cached = self._entries.get(filename)
+
+        # Clé rapide: date de modification + taille
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[3], cached[2]
+
+        # Clé lente: contenu du fichier
+        sha = file_sha256(path)
+        encoding = self._by_hash.get(sha)
+        if encoding is not None:
+            self._entries[filename] = (stat.st_mtime_ns, stat.st_size, sha, encoding)
+            self._dirty = True
+        return encoding, sha
+
+    def put(self, path, encoding, sha=None, stat=None):
+        """
+        Ajouter ou remplacer l'encodage d'un fichier
+
+        Args:
+            path: Chemin du fichier image
+            encoding: Vecteur de caractéristiques (128,)
+            sha: Empreinte SHA-256 déjà calculée (optionnel)
+            stat: Résultat de os.stat déjà disponible (optionnel)
+        """
+        if stat is None:
+            stat = os.stat(path)
+        if sha is None:
+            sha = file_sha256(path)
+        encoding = np.asarray(encoding, dtype=np.float32)
+        self._entries[os.path.basename(path)] = (stat.st_mtime_ns, stat.st_size, sha, encoding)
+        self._by_hash[sha] = encoding
+        self._dirty = True
+
+    def remove(self, filename):
+        """
+        Retirer un fichier du cache
+
+        Args:
+            filename: Nom du fichier image
+        """
+        cached = self._entries.pop(filename, None)
+        if cached is None:
+            return
+        self._dirty = True
+        # Ne garder l'empreinte que si un autre fichier a le même contenu
+        if not any(record[2] == cached[2] for record in self._entries.values()):
+            self._by_hash.pop(cached[2], None)
+
+    def prune(self, filenames):
+        """
+        Retirer du cache les fichiers qui n'existent plus
+
+        Args:
+            filenames: Ensemble des noms de fichiers encore présents
+        """
+        for filename in list(self._entries):
+            if filename not in filenames:
+                del self._entries[filename]
+                self._dirty = True
+
+        if self._dirty:
+            self._by_hash = {sha: encoding for _, _, sha, encoding in self._entries.values()}
+
+    def save(self):
+        """Sauvegarder le cache sur le disque s'il a été modifié"""
+        if not self._dirty:
+            return
+
+        filenames = list(self._entries)
+        records = [self._entries[filename] for filename in filenames]
+
+        if records:
+            encodings = np.stack([record[3] for record in records]).astype(np.float32)
+        else:
+            encodings = np.empty((0, 128), dtype=np.float32)
+
+        # Écriture atomique pour ne jamais laisser un cache tronqué
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                filenames=np.array(filenames, dtype=str),
+                mtimes=np.array([record[0] for record in records], dtype=np.int64),
+                sizes=np.array([record[1] for record in records], dtype=np.int64),
+                hashes=np.array([record[2] for record in records], dtype=str),
+                encodings=encodings,
+                model=np.array(self.model),
+            )
+        os.replace(tmp_path, self.path)
+        self._dirty = False
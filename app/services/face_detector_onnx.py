@@ -0,0 +1,175 @@
+import os
+import logging
+import threading
+from functools import lru_cache
+from itertools import product
+import numpy as np
+import cv2
+
+try:
+    import onnxruntime as ort
+except ImportError:  # onnxruntime est optionnel, repli sur dlib
+    ort = None
+
+# Modèle FaceBoxes exporté en ONNX
+MODEL_PATH = os.path.join(
+    os.path.dirname(__file__), '..', '..', 'models', 'faceboxes.onnx'
+)
+
+# Paramètres des ancres FaceBoxes
+MIN_SIZES = [[32, 64, 128], [256], [512]]
+STEPS = [32, 64, 128]
+VARIANCE = (0.1, 0.2)
+MEAN_BGR = np.array([104, 117, 123], dtype=np.float32)
+
+# Logger de module: le détecteur peut tourner hors contexte Flask (processus d'encodage)
+logger = logging.getLogger(__name__)
+
+_session = None
+_session_lock = threading.Lock()
+_load_failed = False
+
+
+def _get_session():
+    """
+    Charger la session ONNX une seule fois pour tout le processus
+
+    Returns:
+        onnxruntime.InferenceSession ou None si indisponible
+    """
+    global _session, _load_failed
+
+    if _session is not None or _load_failed:
+        return _session
+
+    with _session_lock:
+        if _session is not None or _load_failed:
+            return _session
+
+        if ort is None or not os.path.exists(MODEL_PATH):
+            _load_failed = True
+            return None
+
+        try:
+            sess_options = ort.SessionOptions()
+            sess_options.intra_op_num_threads = os.cpu_count() or 1
+            sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+            providers = ['CPUExecutionProvider']
+            if 'CUDAExecutionProvider' in ort.get_available_providers():
+                providers.insert(0, 'CUDAExecutionProvider')
+
+            _session = ort.InferenceSession(MODEL_PATH, sess_options, providers=providers)
+            logger.info(f"Détecteur ONNX chargé ({', '.join(providers)})")
+        except Exception as e:
+            logger.error(f"Erreur lors du chargement du détecteur ONNX: {str(e)}")
+            _load_failed = True
+
+    return _session
+
+
+def is_available():
+    """Indiquer si le détecteur ONNX peut être utilisé"""
+    return _get_session() is not None
+
+
+@lru_cache(maxsize=8)
+def _priors(height, width):
+    """
+    Générer les ancres FaceBoxes pour une taille d'entrée
+
+    Args:
+        height: Hauteur de l'entrée du réseau
+        width: Largeur de l'entrée du réseau
+
+    Returns:
+        numpy.ndarray: Ancres (P, 4) au format (cx, cy, w, h) normalisé
+    """
+    anchors = []
+    for k, step in enumerate(STEPS):
+        rows, cols = int(np.ceil(height / step)), int(np.ceil(width / step))
+        for i, j in product(range(rows), range(cols)):
+            for min_size in MIN_SIZES[k]:
+                s_kx = min_size / width
+                s_ky = min_size / height
+                # Ancres denses pour les petites tailles
+                if min_size == 32:
+                    offsets = [0, 0.25, 0.5, 0.75]
+                elif min_size == 64:
+                    offsets = [0, 0.5]
+                else:
+                    offsets = [0.5]
+                for dy, dx in product(offsets, offsets):
+                    anchors.append([(j + dx) * step / width, (i + dy) * step / height, s_kx, s_ky])
+    return np.array(anchors, dtype=np.float32)
+
+
+def detect(image_bgr, score_threshold=0.5, nms_threshold=0.3):
+    """
+    Détecter les visages avec le modèle FaceBoxes
+
+    Args:
+        image_bgr: Image au format numpy array BGR
+        score_threshold: Score minimal d'une détection
+        nms_threshold: Seuil de recouvrement pour la suppression des doublons
+
+    Returns:
+        Liste de rectangles (x, y, w, h), ou None si le détecteur est indisponible
+    """
+    session = _get_session()
+    if session is None:
+        return None
+
+    height, width = image_bgr.shape[:2]
+
+    # Utiliser la taille fixe du modèle si elle est définie, sinon celle de l'image
+    input_meta = session.get_inputs()[0]
+    in_h, in_w = input_meta.shape[2], input_meta.shape[3]
+    if not isinstance(in_h, int) or not isinstance(in_w, int):
+        in_h, in_w = height, width
+
+    blob = image_bgr
+    if (in_h, in_w) != (height, width):
+        blob = cv2.resize(np.ascontiguousarray(image_bgr), (in_w, in_h))
+    blob = (blob.astype(np.float32) - MEAN_BGR).transpose(2, 0, 1)[np.newaxis]
+
+    loc, conf = session.run(None, {input_meta.name: np.ascontiguousarray(blob)})
+    loc, scores = loc[0], conf[0][:, 1]
+
+    keep = scores > score_threshold
+    if not np.any(keep):
+        return []
+    loc, scores, priors = loc[keep], scores[keep], _priors(in_h, in_w)[keep]
+
+    # Décoder les boîtes relativement aux ancres
+    centers = priors[:, :2] + loc[:, :2] * VARIANCE[0] * priors[:, 2:]
+    sizes = priors[:, 2:] * np.exp(loc[:, 2:] * VARIANCE[1])
+    boxes = np.concatenate([centers - sizes / 2, sizes], axis=1)
+    boxes *= np.array([width, height, width, height], dtype=np.float32)
+
+    indices = cv2.dnn.NMSBoxes(boxes.tolist(), scores.tolist(), score_threshold, nms_threshold)
+
+    faces = []
+    for i in np.array(indices).flatten():
+        x, y, w, h = boxes[i]
+        x0, y0 = max(0, int(x)), max(0, int(y))
+        x1, y1 = min(width, int(x + w)), min(height, int(y + h))
+        if x1 > x0 and y1 > y0:
+            faces.append((x0, y0, x1 - x0, y1 - y0))
+    return faces
+
+
+def face_locations(image_rgb):
+    """
+    Détecter les visages d'une image RGB au format face_recognition
+
+    Args:
+        image_rgb: Image au format numpy array RGB
+
+    Returns:
+        Liste de rectangles (top, right, bottom, left), ou None si indisponible
+    """
+    faces = detect(image_rgb[:, :, ::-1])
+    if faces is None:
+        return None
+    return [(y, x + w, y + h, x) for x, y, w, h in faces]
@@ -1,47 +1,491 @@
 import os
+import hashlib
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import numpy as np
+import cv2
 import face_recognition
 from werkzeug.utils import secure_filename
 from flask import current_app
-from app.utils.file_utils import allowed_file
+from app.utils.file_utils import allowed_file, sniff
+from app.services.encoding_cache import EncodingCache
+from app.services import face_detector_onnx, match_numba, hnsw_index
+
+try:
+    import faiss
+except ImportError:  # FAISS est optionnel, repli sur NumPy
+    faiss = None
+
+try:
+    import fcntl
+except ImportError:  # fcntl est absent sous Windows, repli sur un seul processus
+    fcntl = None
+
+# Dimension des encodages faciaux de face_recognition
+ENCODING_DIM = 128
 
 # Variables globales pour stocker les visages connus
-known_face_encodings = []
-known_face_names = []
+# Matrice contiguë (N, 128) float32, une ligne par visage
+_enc_matrix = np.empty((0, ENCODING_DIM), dtype=np.float32)
+_names = []
+
+# Normes au carré des lignes, mémorisées pour une matrice donnée: chaque mise à jour
+# de la galerie crée une nouvelle matrice, ce qui invalide la valeur
+_sq_norms = (None, None)
+
+# Galerie quantifiée en int8 pour le balayage sans FAISS: (matrice source, int8, échelle)
+_quantized = (None, None, None)
+
+# Empreinte (ETag) de la liste des noms, mémorisée pour une liste donnée:
+# chaque mise à jour de la galerie publie une nouvelle liste
+_names_etag = (None, None)
+
+# Cache disque des encodages, conservé pour les mises à jour incrémentales
+_cache = None
+
+# Index FAISS (produit scalaire sur vecteurs normalisés = similarité cosinus),
+# ou index hnswlib de même interface pour les grandes galeries sans FAISS
+_faiss_index = None
+
+# Les écritures (ajout, suppression, cache disque) sont sérialisées par _write_lock et
+# publient de nouveaux objets; _gallery_lock ne protège que la publication, pour que
+# les lecteurs prennent un instantané cohérent (matrice, noms, index) sans attendre
+# la reconstruction d'un index
+_write_lock = threading.Lock()
+_gallery_lock = threading.Lock()
+
+# Chaque worker gunicorn garde sa propre copie de la galerie: un écrivain prend le verrou
+# de fichier (entre processus) puis remplace le fichier de génération; les autres workers
+# rechargent la galerie depuis le cache disque dès que la génération a changé
+LOCK_FILENAME = '.gallery.lock'
+GENERATION_FILENAME = '.gallery_generation'
+
+# Génération (inode, mtime) du fichier au dernier chargement ou à la dernière écriture locale
+_gallery_stamp = None
+
+def _normalize(matrix):
+    """Copie des encodages normalisés en norme L2 (similarité cosinus par produit scalaire)"""
+    normalized = np.array(matrix, dtype=np.float32, copy=True)
+    norms = np.linalg.norm(normalized, axis=1, keepdims=True)
+    normalized /= np.maximum(norms, 1e-12)
+    return normalized
+
+def _build_index(matrix):
+    """
+    Construire l'index FAISS sur les encodages connus
+    
+    Args:
+        matrix: Matrice (N, 128) float32 des encodages
+        
+    Returns:
+        Index FAISS (ou hnswlib), None si aucune bibliothèque n'est disponible
+    """
+    if len(matrix) == 0:
+        return None
+    
+    # Recherche exacte pour les petites galeries, HNSW au-delà du seuil
+    hnsw = len(matrix) > current_app.config['FAISS_HNSW_THRESHOLD']
+    
+    if faiss is None:
+        # Sans FAISS: graphe hnswlib pour les grandes galeries, balayage exact sinon
+        if not hnsw or not hnsw_index.is_available():
+            return None
+        index = hnsw_index.HnswIndex(ENCODING_DIM, len(matrix))
+        index.add(_normalize(matrix))
+        return index
+    
+    normalized = _normalize(matrix)
+    
+    if current_app.config['QUANTIZE_ENCODINGS']:
+        # Encodages stockés en int8 (scalar quantizer): 4x moins de mémoire parcourue
+        qtype = faiss.ScalarQuantizer.QT_8bit
+        if hnsw:
+            index = faiss.IndexHNSWSQ(ENCODING_DIM, qtype, 32, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexScalarQuantizer(ENCODING_DIM, qtype, faiss.METRIC_INNER_PRODUCT)
+        index.train(normalized)
+    elif hnsw:
+        index = faiss.IndexHNSWFlat(ENCODING_DIM, 32, faiss.METRIC_INNER_PRODUCT)
+    else:
+        index = faiss.IndexFlatIP(ENCODING_DIM)
+    
+    if hnsw:
+        index.hnsw.efSearch = 64
+    
+    index.add(normalized)
+    return index
+
+def _clone_index(index):
+    """
+    Copier un index avant de le modifier, sans le reconstruire
+    
+    Args:
+        index: Index FAISS ou HnswIndex
+        
+    Returns:
+        Copie indépendante de l'index
+    """
+    if isinstance(index, hnsw_index.HnswIndex):
+        return index.clone()
+    return faiss.clone_index(index)
+
+def _remove_from_index(index, i):
+    """
+    Copier un index sans le vecteur i, sans le reconstruire
+    Les index plats et int8 renumérotent les vecteurs suivants, comme np.delete sur la matrice
+    
+    Args:
+        index: Index FAISS ou HnswIndex (ou None)
+        i: Position du vecteur à retirer
+        
+    Returns:
+        Copie de l'index, ou None si l'index doit être reconstruit (graphes HNSW)
+    """
+    if faiss is None or index is None or isinstance(index, (hnsw_index.HnswIndex, faiss.IndexHNSW)):
+        return None
+    index = _clone_index(index)
+    index.remove_ids(np.array([i], dtype=np.int64))
+    return index
+
+def _within_quantizer_range(index, rows):
+    """
+    Vérifier que des encodages normalisés tiennent dans les bornes du quantificateur int8
+    (sinon ils seraient écrêtés et l'index doit être réentraîné)
+    
+    Args:
+        index: Index FAISS ou HnswIndex
+        rows: Matrice (M, 128) float32 des encodages normalisés
+        
+    Returns:
+        bool: True si les lignes peuvent être ajoutées sans réentraînement
+    """
+    if faiss is None or isinstance(index, hnsw_index.HnswIndex):
+        return True
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    sq = getattr(index, 'sq', None)
+    if sq is None:
+        # Index non quantifié: rien à apprendre
+        return True
+    
+    # QT_8bit: minimum puis étendue de chaque dimension
+    trained = faiss.vector_to_array(sq.trained)
+    vmin, vdiff = trained[:ENCODING_DIM], trained[ENCODING_DIM:2 * ENCODING_DIM]
+    return bool(np.all(rows >= vmin) and np.all(rows <= vmin + vdiff))
+
+def _encode_faces(image, use_onnx=None, model=None):
+    """
+    Encoder les visages d'une image RGB
+    Utilise le détecteur ONNX s'il est disponible, sinon la détection de dlib
+    
+    Args:
+        image: Image au format numpy array RGB
+        use_onnx: Forcer l'usage du détecteur ONNX (par défaut: configuration Flask)
+        model: Modèle de points de repère (par défaut: configuration Flask)
+        
+    Returns:
+        Liste d'encodages faciaux
+    """
+    if use_onnx is None:
+        use_onnx = current_app.config['USE_ONNX_DETECTOR']
+    if model is None:
+        model = current_app.config['FACE_ENCODING_MODEL']
+    
+    face_locations = None
+    if use_onnx:
+        face_locations = face_detector_onnx.face_locations(image) or None
+    return face_recognition.face_encodings(image, face_locations, num_jitters=1, model=model)
 
-def load_known_faces():
-    """Charger tous les visages connus depuis le dossier de stockage"""
-    global known_face_encodings, known_face_names
+def _encode_one(path, use_onnx=False, model='large'):
+    """
+    Encoder le premier visage d'un fichier image
+    Fonction de module pour pouvoir être exécutée dans un processus séparé
+    (pas de contexte Flask disponible)
     
-    # Réinitialiser les listes
-    known_face_encodings = []
-    known_face_names = []
+    Args:
+        path: Chemin de l'image
+        use_onnx: Utiliser le détecteur ONNX
+        model: Modèle de points de repère ('small' ou 'large')
+        
+    Returns:
+        Tuple (encodage ou None, message d'erreur ou None)
+    """
+    try:
+        # Charger l'image
+        image = face_recognition.load_image_file(path)
+        
+        # Essayer de détecter un visage
+        face_encodings = _encode_faces(image, use_onnx, model)
+        if not face_encodings:
+            return None, None
+        
+        # Prendre le premier visage trouvé
+        return np.asarray(face_encodings[0], dtype=np.float32), None
+    except Exception as e:
+        return None, str(e)
+
+def _folder_path(filename):
+    """Chemin d'un fichier de coordination dans le dossier des visages connus"""
+    return os.path.join(current_app.config['KNOWN_FACES_FOLDER'], filename)
+
+@contextmanager
+def _locked_gallery():
+    """Sérialiser les modifications de la galerie entre threads et entre workers"""
+    with _write_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(_folder_path(LOCK_FILENAME), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _generation_stamp():
+    """
+    Lire la génération de la galerie partagée entre workers
+    
+    Returns:
+        Tuple (inode, mtime_ns) du fichier de génération, ou None s'il n'existe pas
+    """
+    try:
+        stat = os.stat(_folder_path(GENERATION_FILENAME))
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+def _bump_generation():
+    """Signaler aux autres workers que la galerie a changé (verrou de _locked_gallery tenu)"""
+    global _gallery_stamp
+    
+    path = _folder_path(GENERATION_FILENAME)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(str(os.getpid()))
+    # Remplacement atomique: nouvel inode, la génération change même à mtime égal
+    os.replace(tmp_path, path)
+    _gallery_stamp = _generation_stamp()
+
+def _refresh_locked():
+    """Recharger la galerie si un autre worker l'a modifiée (verrou de _locked_gallery tenu)"""
+    if _generation_stamp() != _gallery_stamp:
+        current_app.logger.info("Galerie modifiée par un autre worker, rechargement")
+        _load_gallery()
+
+def _sync_gallery():
+    """Vérifier la génération de la galerie (un stat) et recharger si elle a changé"""
+    if _generation_stamp() == _gallery_stamp:
+        return
+    with _locked_gallery():
+        _refresh_locked()
+
+def load_known_faces(startup=False):
+    """
+    Charger tous les visages connus depuis le dossier de stockage
+    
+    Args:
+        startup: Chargement de create_app, peut-être dans le maître gunicorn (--preload)
+    """
+    with _locked_gallery():
+        return _load_gallery(startup)
+
+def _load_gallery(startup=False):
+    """
+    Charger la galerie depuis le dossier et le cache disque (verrou de _locked_gallery tenu)
+    
+    Args:
+        startup: Chargement de create_app, peut-être dans le maître gunicorn (--preload)
+    """
+    global _enc_matrix, _names, _faiss_index, _cache, _gallery_stamp
     
     known_faces_folder = current_app.config['KNOWN_FACES_FOLDER']
+    # Lue avant le parcours: une écriture concurrente provoquera un nouveau rechargement
+    stamp = _generation_stamp()
+    
+    # Charger le cache des encodages déjà calculés
+    model = current_app.config['FACE_ENCODING_MODEL']
+    cache = EncodingCache(known_faces_folder, model)
+    cache.load()
+    _cache = cache
+    
+    with os.scandir(known_faces_folder) as it:
+        entries = [entry for entry in it if entry.is_file() and allowed_file(entry.name)]
+    
+    # Réutiliser les encodages des images qui n'ont pas changé
+    encodings = [None] * len(entries)
+    pending = []
+    
+    for i, entry in enumerate(entries):
+        try:
+            stat = entry.stat()
+            encoding, sha = cache.get(entry.path, stat)
+        except Exception as e:
+            current_app.logger.error(f"Erreur lors du chargement de {entry.name}: {str(e)}")
+            continue
+        
+        if encoding is not None:
+            encodings[i] = encoding
+        else:
+            pending.append((i, entry, stat, sha))
+    
+    # Encoder les nouvelles images en parallèle, un modèle dlib par processus
+    if pending:
+        paths = [entry.path for _, entry, _, _ in pending]
+        use_onnx = current_app.config['USE_ONNX_DETECTOR']
+        workers = min(current_app.config['LOAD_WORKERS'] or os.cpu_count() or 1, len(paths))
+        
+        if workers > 1:
+            # Processus démarrés par forkserver (spawn sans lui) et non par fork de l'appelant:
+            # un worker gthread qui recharge la galerie a des threads actifs (requêtes, Numba,
+            # ONNX Runtime) dont les verrous seraient copiés dans l'état où le fork les trouve
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+                results = list(executor.map(_encode_one, paths, repeat(use_onnx), repeat(model), chunksize=4))
+        else:
+            # Encodage dans ce processus: au démarrage, pas de session ONNX Runtime (pool de
+            # threads intra-op) créée dans le maître avant le fork, repli sur dlib
+            results = [_encode_one(path, use_onnx and not startup, model) for path in paths]
+        
+        for (i, entry, stat, sha), (encoding, error) in zip(pending, results):
+            if error:
+                current_app.logger.error(f"Erreur lors du chargement de {entry.name}: {error}")
+            elif encoding is None:
+                current_app.logger.warning(f"Aucun visage détecté dans {entry.name}")
+            else:
+                encodings[i] = encoding
+                cache.put(entry.path, encoding, sha, stat)
+                current_app.logger.info(f"Visage chargé: {os.path.splitext(entry.name)[0]}")
     
-    for filename in os.listdir(known_faces_folder):
-        if allowed_file(filename):
+    # Préallouer la matrice puis la remplir dans l'ordre du dossier
+    count = sum(encoding is not None for encoding in encodings)
+    matrix = np.empty((count, ENCODING_DIM), dtype=np.float32)
+    names = []
+    
+    for entry, encoding in zip(entries, encodings):
+        if encoding is not None:
+            matrix[len(names)] = encoding
             # Extraire le nom de la personne du nom de fichier
-            name = os.path.splitext(filename)[0]
-            image_path = os.path.join(known_faces_folder, filename)
-            
-            try:
-                # Charger l'image
-                image = face_recognition.load_image_file(image_path)
-                
-                # Essayer de détecter un visage
-                face_encodings = face_recognition.face_encodings(image)
-                if face_encodings:
-                    # Prendre le premier visage trouvé
-                    encoding = face_encodings[0]
-                    known_face_encodings.append(encoding)
-                    known_face_names.append(name)
-                    current_app.logger.info(f"Visage chargé: {name}")
-                else:
-                    current_app.logger.warning(f"Aucun visage détecté dans {filename}")
-            except Exception as e:
-                current_app.logger.error(f"Erreur lors du chargement de {filename}: {str(e)}")
-    
-    return len(known_face_names)
+            names.append(os.path.splitext(entry.name)[0])
+    
+    index = _build_index(matrix)
+    with _gallery_lock:
+        _enc_matrix = matrix
+        _names = names
+        _faiss_index = index
+    _gallery_stamp = stamp
+    
+    # Oublier les images supprimées et persister les nouveaux encodages
+    cache.prune({entry.name for entry in entries})
+    _save_cache()
+    
+    return len(_names)
+
+def _save_cache():
+    """Persister le cache des encodages sans interrompre l'appelant"""
+    if _cache is None:
+        return
+    try:
+        _cache.save()
+    except Exception as e:
+        current_app.logger.error(f"Erreur lors de la sauvegarde du cache d'encodages: {str(e)}")
+
+def _append_encoding(name, encoding, filepath=None, data=None):
+    """
+    Ajouter (ou remplacer) un visage sans recharger toute la galerie
+    
+    Args:
+        name: Nom de la personne
+        encoding: Encodage facial (128,)
+        filepath: Chemin de l'image enregistrée, pour le cache disque
+        data: Contenu de l'image à écrire dans filepath (optionnel)
+    """
+    global _enc_matrix, _names, _faiss_index
+    
+    row = np.asarray(encoding, dtype=np.float32).reshape(1, ENCODING_DIM)
+    
+    with _locked_gallery():
+        # Partir de la galerie à jour si un autre worker l'a modifiée
+        _refresh_locked()
+        
+        # Écrire l'image sous le même verrou que la galerie et le cache: fichier,
+        # encodage et empreinte du cache restent ceux du même enregistrement
+        if data is not None:
+            tmp_file = filepath + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_file, filepath)
+        
+        if name in _names:
+            # Remplacer la ligne existante puis reconstruire l'index
+            matrix = _enc_matrix.copy()
+            matrix[_names.index(name)] = row[0]
+            index = _build_index(matrix)
+            names = _names
+        else:
+            matrix = np.ascontiguousarray(np.vstack([_enc_matrix, row]))
+            names = _names + [name]
+            # Ajout sur une copie de l'index (les recherches en cours gardent l'ancien),
+            # sauf au passage du seuil HNSW ou si l'encodage sort des bornes apprises par
+            # l'index int8 (reconstruction sans réencodage)
+            normalized = _normalize(row)
+            if _faiss_index is not None \
+                    and len(names) != current_app.config['FAISS_HNSW_THRESHOLD'] + 1 \
+                    and _within_quantizer_range(_faiss_index, normalized):
+                index = _clone_index(_faiss_index)
+                index.add(normalized)
+            else:
+                index = _build_index(matrix)
+        
+        with _gallery_lock:
+            _enc_matrix, _names, _faiss_index = matrix, names, index
+        
+        if _cache is not None and filepath:
+            _cache.put(filepath, row[0])
+            _save_cache()
+        _bump_generation()
+
+def _remove_encoding(name, filepath):
+    """
+    Supprimer l'image d'un visage et le retirer de la galerie sans la recharger
+    
+    Args:
+        name: Nom de la personne
+        filepath: Chemin de l'image enregistrée
+        
+    Returns:
+        bool: False si l'image n'existe pas (déjà supprimée par une autre requête)
+    """
+    global _enc_matrix, _names, _faiss_index
+    
+    with _locked_gallery():
+        _refresh_locked()
+        # Existence vérifiée sous le verrou: deux suppressions concurrentes du
+        # même nom ne retirent l'image qu'une fois
+        try:
+            os.remove(filepath)
+        except FileNotFoundError:
+            return False
+        
+        if _cache is not None:
+            _cache.remove(os.path.basename(filepath))
+            _save_cache()
+        
+        if name in _names:
+            i = _names.index(name)
+            matrix = np.ascontiguousarray(np.delete(_enc_matrix, i, axis=0))
+            # Index plat ou int8: retrait de la ligne sur une copie; graphes HNSW: reconstruction
+            index = _remove_from_index(_faiss_index, i) if len(matrix) else None
+            if index is None:
+                index = _build_index(matrix)
+            with _gallery_lock:
+                _enc_matrix, _names, _faiss_index = matrix, _names[:i] + _names[i + 1:], index
+        _bump_generation()
+    return True
 
 def register_face(file, name):
     """Enregistrer un nouveau visage"""
@@ -51,26 +495,32 @@ def register_face(file, name):
     if not allowed_file(file.filename):
         return {'success': False, 'error': "Type de fichier non autorisé"}, 400
     
+    # Vérifier le contenu réel du fichier avant tout décodage
+    if sniff(file.stream) is None:
+        return {'success': False, 'error': "Le fichier n'est pas une image JPEG ou PNG"}, 400
+    
     try:
         # Sécuriser le nom de fichier
         filename = f"{secure_filename(name)}.jpg"
         known_faces_folder = current_app.config['KNOWN_FACES_FOLDER']
         filepath = os.path.join(known_faces_folder, filename)
         
-        # Sauvegarder le fichier
-        file.save(filepath)
+        # Décoder l'image en mémoire, sans passer par le disque
+        buf = file.read()
+        bgr = cv2.imdecode(np.frombuffer(buf, np.uint8), cv2.IMREAD_COLOR)
+        if bgr is None:
+            return {'success': False, 'error': "Image illisible"}, 400
+        image = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
         
         # Vérifier si un visage est détecté
-        image = face_recognition.load_image_file(filepath)
-        face_encodings = face_recognition.face_encodings(image)
+        face_encodings = _encode_faces(image)
         
         if not face_encodings:
-            # Supprimer le fichier si aucun visage n'est détecté
-            os.remove(filepath)
             return {'success': False, 'error': "Aucun visage détecté dans l'image"}, 400
         
-        # Recharger tous les visages
-        load_known_faces()
+        # Sauvegarder le fichier seulement si un visage a été trouvé, et ajouter
+        # uniquement ce visage à la galerie
+        _append_encoding(os.path.splitext(filename)[0], face_encodings[0], filepath, data=buf)
         
         return {'success': True, 'message': f"Visage de {name} enregistré avec succès"}, 200
     
@@ -84,26 +534,127 @@ def delete_face(name):
     known_faces_folder = current_app.config['KNOWN_FACES_FOLDER']
     filepath = os.path.join(known_faces_folder, filename)
     
-    if os.path.exists(filepath):
-        try:
-            os.remove(filepath)
-            # Recharger les visages
-            load_known_faces()
-            return {'success': True, 'message': f"Visage de {name} supprimé avec succès"}, 200
-        except Exception as e:
-            current_app.logger.error(f"Erreur lors de la suppression du visage: {str(e)}")
-            return {'success': False, 'error': f"Erreur lors de la suppression: {str(e)}"}, 500
-    else:
+    try:
+        # Retirer uniquement ce visage de la galerie
+        removed = _remove_encoding(os.path.splitext(filename)[0], filepath)
+    except Exception as e:
+        current_app.logger.error(f"Erreur lors de la suppression du visage: {str(e)}")
+        return {'success': False, 'error': f"Erreur lors de la suppression: {str(e)}"}, 500
+    
+    if not removed:
+        return {'success': False, 'error': f"Aucun visage trouvé pour {name}"}, 404
+    return {'success': True, 'message': f"Visage de {name} supprimé avec succès"}, 200
+
+def get_face(name):
+    """Retourner les informations d'un visage enregistré"""
+    filename = f"{secure_filename(name)}.jpg"
+    filepath = os.path.join(current_app.config['KNOWN_FACES_FOLDER'], filename)
+    
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
         return {'success': False, 'error': f"Aucun visage trouvé pour {name}"}, 404
+    
+    return {
+        'success': True,
+        'name': name,
+        'filename': filename,
+        'size': stat.st_size,
+        'modified': int(stat.st_mtime),
+        'loaded': os.path.splitext(filename)[0] in get_gallery()[1]
+    }, 200
 
 def list_faces():
     """Lister tous les visages enregistrés"""
+    names = get_gallery()[1]
     return {
         'success': True,
-        'known_faces': known_face_names,
-        'count': len(known_face_names)
+        'known_faces': names,
+        'count': len(names)
     }, 200
 
+def get_names_etag(names):
+    """
+    Retourner l'empreinte d'une liste de noms, calculée une fois par liste
+    
+    Args:
+        names: Liste des noms retournée par list_faces
+        
+    Returns:
+        str: Empreinte hexadécimale (ETag)
+    """
+    global _names_etag
+    
+    cached, etag = _names_etag
+    if cached is not names:
+        # Noms triés: les workers n'ont pas tous la même galerie dans le même ordre
+        # (ajout en fin de liste d'un côté, rechargement dans l'ordre du dossier de l'autre)
+        etag = hashlib.blake2b('\0'.join(sorted(names)).encode('utf-8'), digest_size=16).hexdigest()
+        _names_etag = (names, etag)
+    return etag
+
 def get_known_faces():
-    """Retourner les visages connus pour le service de reconnaissance"""
-    return known_face_encodings, known_face_names
\ No newline at end of file
+    """
+    Retourner les visages connus pour le service de reconnaissance
+    
+    Returns:
+        Tuple (matrice (N, 128) float32 des encodages, liste des noms)
+    """
+    _sync_gallery()
+    with _gallery_lock:
+        return _enc_matrix, _names
+
+def get_gallery():
+    """
+    Retourner un instantané cohérent de la galerie pour une requête
+    (les mises à jour concurrentes publient de nouveaux objets sans modifier celui-ci)
+    
+    Returns:
+        Tuple (matrice (N, 128) float32, liste des noms, index FAISS/hnswlib ou None)
+    """
+    # Reprendre les modifications faites par les autres workers gunicorn
+    _sync_gallery()
+    with _gallery_lock:
+        return _enc_matrix, _names, _faiss_index
+
+def get_squared_norms(matrix):
+    """
+    Retourner les normes au carré des encodages connus, calculées une fois par galerie
+    
+    Args:
+        matrix: Matrice des encodages obtenue par get_gallery
+        
+    Returns:
+        numpy.ndarray: Vecteur (N,) float32
+    """
+    global _sq_norms
+    
+    cached, norms = _sq_norms
+    if cached is not matrix:
+        norms = np.einsum('ij,ij->i', matrix, matrix)
+        _sq_norms = (matrix, norms)
+    return norms
+
+def get_quantized_gallery(matrix):
+    """
+    Retourner les encodages connus quantifiés en int8, calculés une fois par galerie
+    
+    Args:
+        matrix: Matrice des encodages obtenue par get_gallery
+        
+    Returns:
+        Tuple (matrice (N, 128) int8, échelle de quantification)
+    """
+    global _quantized
+    
+    cached, quantized, scale = _quantized
+    if cached is not matrix:
+        peak = float(np.abs(matrix).max()) if len(matrix) else 0.0
+        scale = 127.0 / peak if peak > 0 else 1.0
+        quantized = match_numba.quantize(matrix, scale)
+        _quantized = (matrix, quantized, scale)
+    return quantized, scale
+
+def get_index():
+    """Retourner l'index FAISS des visages connus (None si indisponible)"""
+    return _faiss_index
\ No newline at end of file
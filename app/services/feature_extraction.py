@@ -3,9 +3,20 @@ import numpy as np
 import face_recognition
 from enum import Enum
 import os
+import logging
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 import dlib
 from flask import current_app
 from app.utils.image_utils import enhance_image_for_detection
+from app.services import face_detector_onnx
+from app.services.batcher import get_batcher, get_detection_batcher
+
+try:
+    from numba import njit, prange
+except ImportError:  # Numba est optionnel, repli sur NumPy
+    njit = None
 
 
 class FeatureExtractionMethod(Enum):
@@ -17,6 +28,208 @@ class FeatureExtractionMethod(Enum):
 	LBP = "lbp"  # Local Binary Patterns (rapide, simple)
 
 
+# Décalages (ligne, colonne) des 8 voisins LBP, du bit 7 au bit 0
+LBP_NEIGHBORS = ((-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1))
+
+
+def _lbp_histogram_numpy(image):
+    """
+    Histogramme des codes LBP (256 classes) par décalages de tableaux NumPy
+
+    Args:
+        image: Image en niveaux de gris (uint8)
+
+    Returns:
+        Histogramme (256,) des codes, pixels de bord comptés en code 0
+    """
+    center = image[1:-1, 1:-1]
+    lbp = np.zeros(center.shape, dtype=np.uint8)
+    for bit, (di, dj) in zip(range(7, -1, -1), LBP_NEIGHBORS):
+        neighbor = image[1 + di:image.shape[0] - 1 + di, 1 + dj:image.shape[1] - 1 + dj]
+        lbp |= (neighbor >= center).astype(np.uint8) << bit
+
+    hist = np.bincount(lbp.ravel(), minlength=256)
+    hist[0] += image.size - center.size
+    return hist
+
+
+if njit is not None:
+    @njit(cache=True, parallel=True, fastmath=True)
+    def _lbp_histogram(image):
+        """
+        Histogramme des codes LBP en une seule passe compilée
+        Un histogramme par ligne (aucune contention entre threads), réduit à la fin
+        """
+        h, w = image.shape
+        rows = np.zeros((h, 256), dtype=np.int64)
+        for i in prange(1, h - 1):
+            for j in range(1, w - 1):
+                c = image[i, j]
+                code = ((image[i - 1, j - 1] >= c) << 7) | ((image[i - 1, j] >= c) << 6) \
+                    | ((image[i - 1, j + 1] >= c) << 5) | ((image[i, j + 1] >= c) << 4) \
+                    | ((image[i + 1, j + 1] >= c) << 3) | ((image[i + 1, j] >= c) << 2) \
+                    | ((image[i + 1, j - 1] >= c) << 1) | (image[i, j - 1] >= c)
+                rows[i, code] += 1
+        hist = rows.sum(axis=0)
+        # Les pixels de bord gardent le code 0
+        hist[0] += h * w - max(h - 2, 0) * max(w - 2, 0)
+        return hist
+else:
+    _lbp_histogram = _lbp_histogram_numpy
+
+
+# Activer les chemins optimisés d'OpenCV (SSE4/AVX2/AVX-512/NEON selon le CPU)
+cv2.setUseOptimized(True)
+logger = logging.getLogger(__name__)
+# Les informations de compilation (plusieurs Ko) ne sont lues qu'en mode debug
+if logger.isEnabledFor(logging.DEBUG):
+    logger.debug(
+        "OpenCV %s, optimisations: %s, %s",
+        cv2.__version__,
+        cv2.useOptimized(),
+        "; ".join(
+            line.strip() for line in cv2.getBuildInformation().splitlines()
+            if "Baseline" in line or "Dispatched code generation" in line
+        ),
+    )
+
+# Paramètres du HOG rapide, identiques au descripteur OpenCV (64x64, blocs 16, cellules 8, 9 classes)
+HOG_CELL = 8
+HOG_BINS = 9
+HOG_CLIP = 0.2  # Seuil L2-Hys
+HOG_LENGTH = (64 // HOG_CELL - 1) ** 2 * 4 * HOG_BINS  # 1764 valeurs par visage
+
+# Tables indexées par (gx + 255, gy + 255): classe d'orientation non signée et module du gradient
+_gx, _gy = np.meshgrid(np.arange(-255, 256), np.arange(-255, 256), indexing='ij')
+_HOG_BIN_LUT = (
+    (np.degrees(np.arctan2(_gy, _gx)) % 180.0) // (180.0 / HOG_BINS)
+).astype(np.intp) % HOG_BINS
+_HOG_MAG_LUT = np.hypot(_gx, _gy).astype(np.float32)
+del _gx, _gy
+
+
+def _fast_hog(face64, out=None):
+    """
+    Descripteur HOG par tables de correspondance et image intégrale
+
+    Args:
+        face64: Visage 64x64 en niveaux de gris (uint8)
+        out: Vecteur (1764,) float32 où écrire le descripteur (optionnel)
+
+    Returns:
+        Vecteur (1764,) float32, même taille que cv2.HOGDescriptor((64, 64), (16, 16), (8, 8), (8, 8), 9)
+    """
+    # 1. Gradients [-1, 0, 1] (entiers dans [-255, 255])
+    gx = cv2.Sobel(face64, cv2.CV_16S, 1, 0, ksize=1).astype(np.intp) + 255
+    gy = cv2.Sobel(face64, cv2.CV_16S, 0, 1, ksize=1).astype(np.intp) + 255
+
+    # 2. Orientation et module lus dans les tables
+    bins = _HOG_BIN_LUT[gx, gy]
+    magnitude = _HOG_MAG_LUT[gx, gy]
+
+    # 3. Histogrammes par cellule de 8x8 pixels
+    h, w = face64.shape
+    rows, cols = h // HOG_CELL, w // HOG_CELL
+    cell_rows = np.arange(h)[:, None] // HOG_CELL
+    cell_cols = np.arange(w)[None, :] // HOG_CELL
+    keys = ((cell_rows * cols + cell_cols) * HOG_BINS + bins).ravel()
+    cells = np.bincount(keys, weights=magnitude.ravel(), minlength=rows * cols * HOG_BINS)
+    cells = cells.astype(np.float32).reshape(rows, cols, HOG_BINS)
+
+    # 4. Image intégrale de l'énergie des cellules
+    energy = cv2.integral(np.einsum('ijk,ijk->ij', cells, cells))
+
+    # 5. Blocs 2x2 (pas d'une cellule): énergie en 4 lectures, puis normalisation L2-Hys
+    block_energy = energy[2:, 2:] - energy[:-2, 2:] - energy[2:, :-2] + energy[:-2, :-2]
+    blocks = np.stack(
+        [cells[:-1, :-1], cells[1:, :-1], cells[:-1, 1:], cells[1:, 1:]], axis=2
+    ).reshape(rows - 1, cols - 1, 4 * HOG_BINS)
+    blocks /= np.sqrt(block_energy, dtype=np.float32)[..., None] + 1e-5
+    np.minimum(blocks, HOG_CLIP, out=blocks)
+    blocks /= np.linalg.norm(blocks, axis=2, keepdims=True) + 1e-5
+
+    if out is None:
+        return blocks.ravel()
+    out[:] = blocks.ravel()
+    return out
+
+
+@lru_cache(maxsize=1)
+def _get_cnn_detector():
+    """
+    Retourner le détecteur CNN dlib (MMOD) partagé par tout le processus
+    Chargé au premier usage; sur une build dlib CUDA, les poids restent sur le GPU
+
+    Returns:
+        dlib.cnn_face_detection_model_v1
+    """
+    model_path = os.path.join(
+        os.path.dirname(__file__), "..", "..", "models", "mmod_human_face_detector.dat"
+    )
+    if os.path.exists(model_path):
+        current_app.logger.info(
+            f"Détecteur CNN chargé depuis {model_path} ({'CUDA' if dlib.DLIB_USE_CUDA else 'CPU'})"
+        )
+        return dlib.cnn_face_detection_model_v1(model_path)
+
+    # Modèle fourni avec face_recognition_models
+    return face_recognition.api.cnn_face_detector
+
+
+@lru_cache(maxsize=1)
+def _get_gpu_executor():
+    """
+    Retourner le thread unique qui exécute les détections CNN sur GPU
+    Un seul contexte CUDA, des requêtes concurrentes qui ne se disputent pas la mémoire du GPU
+
+    Returns:
+        concurrent.futures.ThreadPoolExecutor à un seul thread
+    """
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix='gpu')
+
+
+_cv_local = threading.local()
+
+
+def _cv_objects():
+    """
+    Retourner les objets OpenCV coûteux à construire (descripteur HOG, cascades)
+    Construits une seule fois par thread: les fichiers XML ne sont analysés qu'une fois,
+    sans partager un CascadeClassifier entre threads (detectMultiScale n'est pas réentrant)
+
+    Returns:
+        Espace de noms avec les attributs hog64, haar et lbp_cascade
+    """
+    if not hasattr(_cv_local, 'hog64'):
+        _cv_local.hog64 = cv2.HOGDescriptor((64, 64), (16, 16), (8, 8), (8, 8), 9)
+        _cv_local.haar = cv2.CascadeClassifier(
+            cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+        )
+        _cv_local.lbp_cascade = cv2.CascadeClassifier(
+            cv2.data.haarcascades + "lbpcascade_frontalface.xml"
+        )
+    return _cv_local
+
+
+def _cascade_to_css(opencv_faces):
+    """
+    Convertir les rectangles d'une cascade OpenCV au format face_recognition
+
+    Args:
+        opencv_faces: Tableau (N, 4) de rectangles (x, y, w, h)
+
+    Returns:
+        Liste de rectangles (top, right, bottom, left)
+    """
+    if len(opencv_faces) == 0:
+        return []
+
+    # Permutation des colonnes en une passe, conversion en entiers Python en C
+    faces = np.asarray(opencv_faces)
+    x, y, w, h = faces.T
+    return list(zip(y.tolist(), (x + w).tolist(), (y + h).tolist(), x.tolist()))
+
+
 class FeatureExtractor:
     """
     Classe pour gérer l'extraction de caractéristiques faciales
@@ -32,23 +245,13 @@ class FeatureExtractor:
         """
         self.set_method(method)
 
-        # Charger le modèle CNN pré-entraîné si nécessaire
-        if method == FeatureExtractionMethod.CNN:
-            # Vérifier si le modèle est disponible
-            model_path = os.path.join(
-                os.path.dirname(__file__),
-                "..",
-                "..",
-                "models",
-                "mmod_human_face_detector.dat",
-            )
-            if os.path.exists(model_path):
-                self.cnn_face_detector = dlib.cnn_face_detection_model_v1(model_path)
-            else:
-                current_app.logger.warning(
-                    f"Modèle CNN non trouvé à {model_path}, retour à HOG"
-                )
-                self.method = FeatureExtractionMethod.HOG
+        # Dernière image convertie en niveaux de gris (partagée entre détection et extraction)
+        self._gray_source = None
+        self._gray = None
+
+        # Tampons réutilisés pour chaque visage de l'extraction personnalisée
+        self._buf128 = np.empty((128, 128), dtype=np.uint8)
+        self._buf64 = np.empty((64, 64), dtype=np.uint8)
 
     def set_method(self, method):
         """
@@ -68,6 +271,26 @@ class FeatureExtractor:
         else:
             self.method = method
 
+        # Charger le détecteur CNN dès la sélection de la méthode (une fois par processus)
+        if self.method == FeatureExtractionMethod.CNN:
+            _get_cnn_detector()
+
+    def _to_gray(self, image):
+        """
+        Convertir une image RGB en niveaux de gris une seule fois
+        La détection et l'extraction d'une même image réutilisent le résultat
+
+        Args:
+            image: Image au format numpy array RGB
+
+        Returns:
+            Image en niveaux de gris (uint8)
+        """
+        if image is not self._gray_source:
+            self._gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+            self._gray_source = image
+        return self._gray
+
     def detect_faces(self, image):
         """
         Détecter les visages dans une image avec la méthode configurée
@@ -79,14 +302,38 @@ class FeatureExtractor:
             List de rectangles (top, right, bottom, left) ou liste vide
         """
         if self.method == FeatureExtractionMethod.HOG:
+            # Utiliser le détecteur ONNX s'il est disponible
+            if current_app.config['USE_ONNX_DETECTOR']:
+                face_locations = face_detector_onnx.face_locations(image)
+                if face_locations is not None:
+                    return face_locations
+
             # Utiliser la méthode HOG de face_recognition
             face_locations = face_recognition.face_locations(image, model="hog")
             return face_locations
 
         elif self.method == FeatureExtractionMethod.CNN:
-            # Utiliser la méthode CNN de face_recognition
-            face_locations = face_recognition.face_locations(image, model="cnn")
-            return face_locations
+            # Sur GPU, regrouper les détections des requêtes concurrentes
+            if current_app.config['MICRO_BATCHING'] and dlib.DLIB_USE_CUDA:
+                batcher = get_detection_batcher(
+                    current_app.config['DETECTION_BATCH_SIZE'],
+                    current_app.config['BATCH_MAX_WAIT_MS'] / 1000.0,
+                )
+                return batcher.detect(image)
+
+            # Détecteur CNN partagé (suréchantillonnage x1, comme face_recognition)
+            detector = _get_cnn_detector()
+            if dlib.DLIB_USE_CUDA:
+                # dlib libère le GIL pendant l'inférence: les autres requêtes continuent
+                detections = _get_gpu_executor().submit(detector, image, 1).result()
+            else:
+                detections = detector(image, 1)
+            return [
+                face_recognition.api._trim_css_to_bounds(
+                    face_recognition.api._rect_to_css(detection.rect), image.shape
+                )
+                for detection in detections
+            ]
 
         elif self.method == FeatureExtractionMethod.CUSTOM_HOG:
             # Notre implémentation personnalisée HOG
@@ -117,9 +364,19 @@ class FeatureExtractor:
         ):
             # Utiliser notre propre méthode d'extraction de caractéristiques
             return self._custom_feature_extraction(image, face_locations)
+        elif current_app.config['MICRO_BATCHING']:
+            # Regrouper avec les requêtes concurrentes en un seul appel ResNet
+            batcher = get_batcher(
+                current_app.config['BATCH_MAX_SIZE'],
+                current_app.config['BATCH_MAX_WAIT_MS'] / 1000.0,
+            )
+            return batcher.encode(image, face_locations, current_app.config['FACE_ENCODING_MODEL'])
         else:
             # Utiliser l'encodage standard de face_recognition
-            return face_recognition.face_encodings(image, face_locations)
+            return face_recognition.face_encodings(
+                image, face_locations, num_jitters=1,
+                model=current_app.config['FACE_ENCODING_MODEL']
+            )
 
     def _custom_hog_detection(self, image):
         """
@@ -131,29 +388,22 @@ class FeatureExtractor:
         Returns:
             Liste de rectangles (top, right, bottom, left)
         """
-        # Convertir en niveaux de gris
-        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        # Convertir en niveaux de gris (réutilisé par l'extraction)
+        gray = self._to_gray(image)
 
-        # Chargement du classifier Haar Cascade pour la détection de visages
-        face_cascade = cv2.CascadeClassifier(
-            cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-        )
+        # Classifier Haar Cascade pour la détection de visages (chargé une fois par thread)
+        face_cascade = _cv_objects().haar
 
-        # Détection de visages
+        # Détection de visages (UMat: OpenCL si un périphérique est présent, sinon SIMD CPU)
         opencv_faces = face_cascade.detectMultiScale(
-            gray,
+            cv2.UMat(gray),
             scaleFactor=1.1,
             minNeighbors=5,
             minSize=(30, 30),
             flags=cv2.CASCADE_SCALE_IMAGE,
         )
 
-        # Convertir au format face_recognition (top, right, bottom, left)
-        face_locations = []
-        for x, y, w, h in opencv_faces:
-            face_locations.append((y, x + w, y + h, x))  # top, right, bottom, left
-
-        return face_locations
+        return _cascade_to_css(opencv_faces)
 
     def _lbp_detection(self, image):
         """
@@ -165,29 +415,22 @@ class FeatureExtractor:
         Returns:
             Liste de rectangles (top, right, bottom, left)
         """
-        # Convertir en niveaux de gris
-        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        # Convertir en niveaux de gris (réutilisé par l'extraction)
+        gray = self._to_gray(image)
 
-        # Chargement du classifier LBP pour la détection de visages
-        lbp_face_cascade = cv2.CascadeClassifier(
-            cv2.data.haarcascades + "lbpcascade_frontalface.xml"
-        )
+        # Classifier LBP pour la détection de visages (chargé une fois par thread)
+        lbp_face_cascade = _cv_objects().lbp_cascade
 
-        # Détection de visages avec LBP
+        # Détection de visages avec LBP (UMat: OpenCL si un périphérique est présent)
         opencv_faces = lbp_face_cascade.detectMultiScale(
-            gray,
+            cv2.UMat(gray),
             scaleFactor=1.1,
             minNeighbors=4,
             minSize=(30, 30),
             flags=cv2.CASCADE_SCALE_IMAGE,
         )
 
-        # Convertir au format face_recognition (top, right, bottom, left)
-        face_locations = []
-        for x, y, w, h in opencv_faces:
-            face_locations.append((y, x + w, y + h, x))  # top, right, bottom, left
-
-        return face_locations
+        return _cascade_to_css(opencv_faces)
 
     def _custom_feature_extraction(self, image, face_locations):
         """
@@ -199,74 +442,53 @@ class FeatureExtractor:
             face_locations: Liste de rectangles (top, right, bottom, left)
 
         Returns:
-            Liste d'encodages faciaux (vecteurs de caractéristiques)
+            Matrice (N, 1764 + 256) float32, une ligne normalisée par visage
         """
-        features = []
+        features = np.empty((len(face_locations), HOG_LENGTH + 256), dtype=np.float32)
 
-        # Convertir en niveaux de gris
-        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        # Niveaux de gris déjà calculés lors de la détection
+        gray = self._to_gray(image)
 
-        for face_location in face_locations:
-            top, right, bottom, left = face_location
-            face_image = gray[top:bottom, left:right]
-
-            # Redimensionner pour standardiser
-            face_image = cv2.resize(face_image, (128, 128))
-
-            # 1. Caractéristiques HOG
-            hog = cv2.HOGDescriptor((64, 64), (16, 16), (8, 8), (8, 8), 9)
-            h = hog.compute(cv2.resize(face_image, (64, 64)))
+        # HOG rapide par défaut, descripteur OpenCV en repli
+        hog = None if current_app.config['FAST_HOG'] else _cv_objects().hog64
 
-            # 2. Caractéristiques LBP
-            lbp_features = self._extract_lbp_features(face_image)
+        for i, face_location in enumerate(face_locations):
+            top, right, bottom, left = face_location
+            # Redimensionner pour standardiser (128 pour LBP, 64 pour HOG), dans les tampons
+            face_image = cv2.resize(gray[top:bottom, left:right], (128, 128), dst=self._buf128)
+            face64 = cv2.resize(face_image, (64, 64), dst=self._buf64, interpolation=cv2.INTER_AREA)
 
-            # 3. Combiner les caractéristiques et normaliser
-            combined_features = np.concatenate([h.flatten(), lbp_features.flatten()])
+            # 1. Caractéristiques HOG, écrites directement dans la ligne du visage
+            if hog is None:
+                _fast_hog(face64, out=features[i, :HOG_LENGTH])
+            else:
+                features[i, :HOG_LENGTH] = hog.compute(face64).ravel()
 
-            # Normalisation
-            norm = np.linalg.norm(combined_features)
-            if norm > 0:
-                combined_features = combined_features / norm
+            # 2. Caractéristiques LBP, à la suite dans la même ligne
+            self._extract_lbp_features(face_image, out=features[i, HOG_LENGTH:])
 
-            features.append(combined_features)
+        # 3. Normaliser toutes les lignes en une passe (les lignes nulles restent nulles)
+        norms = np.linalg.norm(features, axis=1, keepdims=True)
+        features /= np.maximum(norms, 1e-7)
 
         return features
 
-    def _extract_lbp_features(self, image):
+    def _extract_lbp_features(self, image, out=None):
         """
         Extraire les caractéristiques LBP d'une image
 
         Args:
             image: Image en niveaux de gris
+            out: Vecteur (256,) où écrire l'histogramme normalisé (optionnel)
 
         Returns:
             Vecteur de caractéristiques LBP
         """
-        lbp_image = np.zeros_like(image)
-
-        # Pour chaque pixel (sauf les bords)
-        for i in range(1, image.shape[0] - 1):
-            for j in range(1, image.shape[1] - 1):
-                center = image[i, j]
-                code = 0
-
-                # Parcourir les 8 voisins
-                code |= (image[i - 1, j - 1] >= center) << 7
-                code |= (image[i - 1, j] >= center) << 6
-                code |= (image[i - 1, j + 1] >= center) << 5
-                code |= (image[i, j + 1] >= center) << 4
-                code |= (image[i + 1, j + 1] >= center) << 3
-                code |= (image[i + 1, j] >= center) << 2
-                code |= (image[i + 1, j - 1] >= center) << 1
-                code |= (image[i, j - 1] >= center) << 0
-
-                lbp_image[i, j] = code
-
-        # Calculer l'histogramme LBP
-        hist, _ = np.histogram(lbp_image.ravel(), bins=256, range=[0, 256])
+        hist = _lbp_histogram(np.ascontiguousarray(image))
 
         # Normaliser l'histogramme
-        hist = hist.astype("float")
-        hist /= hist.sum() + 1e-7
+        if out is None:
+            out = np.empty(hist.shape, dtype="float")
+        np.divide(hist, hist.sum() + 1e-7, out=out)
 
-        return hist
+        return out
@@ -0,0 +1,69 @@
+import copy
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:  # hnswlib est optionnel, utilisé seulement sans FAISS
+    hnswlib = None
+
+
+def is_available():
+    """Indiquer si hnswlib peut être utilisé"""
+    return hnswlib is not None
+
+
+class HnswIndex:
+    """
+    Index HNSW (hnswlib) exposant la même interface que les index FAISS utilisés
+    par le service: attribut d, add(x) et search(x, k) -> (similarités, indices)
+    """
+
+    def __init__(self, dim, capacity, m=16, ef_construction=200, ef_search=64):
+        """
+        Initialiser un index vide
+
+        Args:
+            dim: Dimension des vecteurs
+            capacity: Nombre de vecteurs prévus (agrandi automatiquement)
+            m: Nombre de voisins par nœud du graphe
+            ef_construction: Largeur de recherche à la construction
+            ef_search: Largeur de recherche à l'interrogation
+        """
+        self.d = dim
+        self.ntotal = 0
+        self._index = hnswlib.Index(space='ip', dim=dim)
+        self._index.init_index(max_elements=max(capacity, 1), ef_construction=ef_construction, M=m)
+        self._index.set_ef(ef_search)
+
+    def add(self, vectors):
+        """
+        Ajouter des vecteurs normalisés à la suite des précédents
+
+        Args:
+            vectors: Matrice (N, d) float32
+        """
+        count = len(vectors)
+        capacity = self._index.get_max_elements()
+        if self.ntotal + count > capacity:
+            self._index.resize_index(max(capacity * 2, self.ntotal + count))
+        self._index.add_items(vectors, np.arange(self.ntotal, self.ntotal + count))
+        self.ntotal += count
+
+    def clone(self):
+        """Copie indépendante de l'index (hnswlib.Index est sérialisable)"""
+        return copy.deepcopy(self)
+
+    def search(self, queries, k):
+        """
+        Rechercher les k plus proches voisins en produit scalaire
+
+        Args:
+            queries: Matrice (Q, d) float32 de vecteurs normalisés
+            k: Nombre de voisins
+
+        Returns:
+            Tuple (similarités (Q, k), indices (Q, k)), comme faiss.Index.search
+        """
+        labels, distances = self._index.knn_query(queries, k=min(k, self.ntotal))
+        # hnswlib retourne 1 - produit scalaire
+        return 1.0 - distances, labels.astype(np.int64)
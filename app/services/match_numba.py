@@ -0,0 +1,99 @@
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:  # Numba est optionnel, repli sur NumPy
+    njit = None
+
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _squared_distances(matrix, query):
+        """Distances euclidiennes au carré entre chaque ligne et la requête"""
+        n, d = matrix.shape
+        out = np.empty(n, dtype=np.float32)
+        for i in prange(n):
+            s = 0.0
+            for k in range(d):
+                diff = matrix[i, k] - query[k]
+                s += diff * diff
+            out[i] = s
+        return out
+
+    @njit(parallel=True, cache=True)
+    def _squared_distances_int8(matrix, query):
+        """Distances au carré sur encodages int8, accumulées en int32"""
+        n, d = matrix.shape
+        out = np.empty(n, dtype=np.int32)
+        for i in prange(n):
+            s = np.int32(0)
+            for k in range(d):
+                diff = np.int32(matrix[i, k]) - np.int32(query[k])
+                s += diff * diff
+            out[i] = s
+        return out
+
+
+def is_available():
+    """Indiquer si le noyau Numba peut être utilisé"""
+    return njit is not None
+
+
+def best_match(matrix, query):
+    """
+    Trouver la ligne la plus proche d'une requête (distance euclidienne)
+    
+    Args:
+        matrix: Matrice (N, D) float32 contiguë des encodages connus
+        query: Vecteur (D,) float32
+        
+    Returns:
+        Tuple (indice du meilleur match, distance euclidienne)
+    """
+    distances = _squared_distances(matrix, query)
+    best_index = int(np.argmin(distances))
+    return best_index, float(np.sqrt(distances[best_index]))
+
+
+def quantize(matrix, scale):
+    """
+    Quantifier des encodages en int8 avec une échelle commune
+    
+    Args:
+        matrix: Encodages float32 (N, D) ou (D,)
+        scale: Facteur appliqué avant arrondi (127 / valeur absolue maximale)
+        
+    Returns:
+        numpy.ndarray int8 de même forme
+    """
+    return np.clip(np.rint(matrix * scale), -127, 127).astype(np.int8)
+
+
+def candidates_int8(matrix, query, k):
+    """
+    Présélectionner les k lignes les plus proches sur les encodages int8
+    
+    Args:
+        matrix: Matrice (N, D) int8 contiguë des encodages connus quantifiés
+        query: Vecteur (D,) int8 quantifié avec la même échelle
+        k: Nombre de candidats à retourner
+        
+    Returns:
+        numpy.ndarray: Indices des candidats (non triés)
+    """
+    distances = _squared_distances_int8(matrix, query)
+    if k >= len(distances):
+        return np.arange(len(distances))
+    return np.argpartition(distances, k)[:k]
+
+
+def warmup(dim=128):
+    """
+    Compiler les noyaux à l'avance pour éviter le coût JIT à la première requête
+    Compilation sans exécution: le pool de threads de Numba n'est pas démarré,
+    la fonction peut donc être appelée avant le fork des workers gunicorn
+    """
+    if njit is None:
+        return
+    _squared_distances.compile('float32[:, ::1], float32[::1]')
+    _squared_distances_int8.compile('int8[:, ::1], int8[::1]')
@@ -1,12 +1,147 @@
-import face_recognition
 import numpy as np
 import cv2
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import face_recognition
 from flask import current_app
 from werkzeug.utils import secure_filename
-from app.services.face_service import get_known_faces
+from app.services.face_service import get_gallery, get_squared_norms, get_quantized_gallery
 from app.services.feature_extraction import FeatureExtractor, FeatureExtractionMethod
-from app.services.cnn_model import CNNFaceModel
+from app.services import match_numba, face_detector_onnx
+
+# Pool partagé pour la détection HOG de repli lancée en parallèle
+_fallback_executor = None
+_fallback_lock = threading.Lock()
+
+def _get_fallback_executor():
+    """Retourner le pool de détection de repli du processus (créé au premier appel)"""
+    global _fallback_executor
+    
+    if _fallback_executor is None:
+        with _fallback_lock:
+            if _fallback_executor is None:
+                _fallback_executor = ThreadPoolExecutor(
+                    max_workers=os.cpu_count() or 1, thread_name_prefix='fallback-hog'
+                )
+    return _fallback_executor
+
+def _hog_face_locations(image, use_onnx):
+    """
+    Détection de repli exécutée hors du thread de la requête
+    (aucun accès au contexte Flask: la configuration est passée en argument)
+    
+    Args:
+        image: Image au format numpy array RGB
+        use_onnx: Utiliser le détecteur ONNX s'il est disponible
+        
+    Returns:
+        Liste de rectangles (top, right, bottom, left)
+    """
+    if use_onnx:
+        face_locations = face_detector_onnx.face_locations(image)
+        if face_locations is not None:
+            return face_locations
+    return face_recognition.face_locations(image, model="hog")
+
+def _rerank(query, candidates, known_face_encodings):
+    """
+    Choisir parmi des candidats le visage le plus proche en distance exacte float32
+    (conserve la sémantique du seuil de reconnaissance)
+    
+    Args:
+        query: Encodage (D,) float32 du visage à identifier
+        candidates: Indices des candidats dans la galerie
+        known_face_encodings: Matrice (N, D) float32 des encodages connus
+        
+    Returns:
+        Tuple (indice du meilleur match, distance euclidienne)
+    """
+    distances = np.linalg.norm(known_face_encodings[candidates] - query, axis=1)
+    best = int(np.argmin(distances))
+    return candidates[best], distances[best]
+
+def _best_matches(face_encodings, known_face_encodings, index=None, k=1, known_sq_norms=None,
+                  quantized=None):
+    """
+    Trouver le visage connu le plus proche de chaque encodage d'une image
+    
+    Args:
+        face_encodings: Liste des encodages des visages à identifier
+        known_face_encodings: Matrice (N, D) float32 des encodages connus
+        index: Index FAISS (ou hnswlib) optionnel sur les encodages normalisés
+        k: Nombre de candidats de l'index réordonnés par distance exacte
+        known_sq_norms: Normes au carré des encodages connus, si déjà calculées
+        quantized: Tuple (galerie int8, échelle) pour une présélection int8 sans FAISS
+        
+    Returns:
+        Tuple (indices des meilleurs matchs, distances euclidiennes), un élément par visage
+    """
+    queries = np.ascontiguousarray(np.stack(face_encodings), dtype=np.float32)
+    
+    if index is not None and queries.shape[1] == index.d:
+        # Candidats les plus proches en similarité cosinus, toutes les requêtes en un appel
+        normalized = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        _, candidates = index.search(normalized, min(k, len(known_face_encodings)))
+        
+        best_indices = np.empty(len(queries), dtype=np.int64)
+        best_distances = np.empty(len(queries), dtype=np.float32)
+        for i, (query, row) in enumerate(zip(queries, candidates)):
+            row = row[row >= 0]
+            if len(row) == 0:
+                row = np.arange(len(known_face_encodings))
+            best_indices[i], best_distances[i] = _rerank(query, row, known_face_encodings)
+        return best_indices, best_distances
+    
+    # Grande galerie sans FAISS: balayage int8 (4x moins d'octets) puis réordonnancement float32
+    if quantized is not None and match_numba.is_available() \
+            and queries.shape[1] == known_face_encodings.shape[1]:
+        gallery_int8, scale = quantized
+        query_int8 = match_numba.quantize(queries, scale)
+        
+        best_indices = np.empty(len(queries), dtype=np.int64)
+        best_distances = np.empty(len(queries), dtype=np.float32)
+        for i, query in enumerate(queries):
+            row = match_numba.candidates_int8(gallery_int8, query_int8[i], k)
+            best_indices[i], best_distances[i] = _rerank(query, row, known_face_encodings)
+        return best_indices, best_distances
+    
+    # Un seul visage: noyau Numba parallèle si disponible
+    if len(queries) == 1 and match_numba.is_available() and queries.shape[1] == known_face_encodings.shape[1]:
+        best_index, distance = match_numba.best_match(known_face_encodings, queries[0])
+        return np.array([best_index]), np.array([distance], dtype=np.float32)
+    
+    # Plusieurs visages: une seule multiplication matricielle (N, D) x (D, K)
+    # |q - g|² = |q|² + |g|² - 2 q.g
+    if known_sq_norms is None:
+        known_sq_norms = np.einsum('ij,ij->i', known_face_encodings, known_face_encodings)
+    squared = (
+        np.einsum('ij,ij->i', queries, queries)[:, None]
+        + known_sq_norms[None, :]
+        - 2.0 * (queries @ known_face_encodings.T)
+    )
+    best_indices = np.argmin(squared, axis=1)
+    best_squared = squared[np.arange(len(queries)), best_indices]
+    return best_indices, np.sqrt(np.maximum(best_squared, 0.0))
+
+_cnn_model_lock = threading.Lock()
+
+def _get_cnn_model():
+    """
+    Retourner le modèle CNN du worker, créé à la première utilisation
+    (TensorFlow et CUDA ne supportent pas le fork: jamais dans le processus maître)
+    
+    Returns:
+        CNNFaceModel
+    """
+    cnn_model = current_app.extensions.get('cnn_model')
+    if cnn_model is None:
+        with _cnn_model_lock:
+            cnn_model = current_app.extensions.get('cnn_model')
+            if cnn_model is None:
+                from app.services.cnn import CNNFaceModel
+                cnn_model = current_app.extensions['cnn_model'] = CNNFaceModel()
+    return cnn_model
 
 def recognize_faces(file, save_result=True, method='hog', use_cnn_model=False):
     """
@@ -25,14 +160,16 @@ def recognize_faces(file, save_result=True, method='hog', use_cnn_model=False):
         return {'success': False, 'error': "Aucun fichier n'a été soumis"}, 400
     
     try:
-        # Sauvegarder temporairement le fichier
-        filename = secure_filename(file.filename)
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        filepath = os.path.join(upload_folder, filename)
-        file.save(filepath)
-        
-        # Charger l'image
-        image = face_recognition.load_image_file(filepath)
+        # Décoder l'image directement depuis le flux, sans passer par le disque
+        image_bgr = cv2.imdecode(np.frombuffer(file.read(), np.uint8), cv2.IMREAD_COLOR)
+        if image_bgr is None:
+            return {'success': False, 'error': "Format d'image non reconnu"}, 400
+        if save_result:
+            # Garder le tampon BGR pour l'annotation
+            image = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
+        else:
+            # Rien à dessiner: convertir en place, sans seconde image
+            image = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB, dst=image_bgr)
         
         # Initialiser l'extracteur de caractéristiques
         feature_extractor = FeatureExtractor(method=method)
@@ -40,12 +177,19 @@ def recognize_faces(file, save_result=True, method='hog', use_cnn_model=False):
         # Initialiser le modèle CNN si demandé
         cnn_model = None
         if use_cnn_model:
-            cnn_model = CNNFaceModel()
+            cnn_model = _get_cnn_model()
             if not cnn_model.is_trained:
                 # Entraîner le modèle si nécessaire
                 known_faces_folder = current_app.config['KNOWN_FACES_FOLDER']
                 cnn_model.train(known_faces_folder)
         
+        # Lancer la détection HOG de repli en parallèle (dlib et OpenCV libèrent le GIL)
+        fallback = None
+        if method != 'hog' and current_app.config['PARALLEL_FALLBACK_DETECTION']:
+            fallback = _get_fallback_executor().submit(
+                _hog_face_locations, image, current_app.config['USE_ONNX_DETECTOR']
+            )
+        
         # Détecter les visages avec la méthode spécifiée
         face_locations = feature_extractor.detect_faces(image)
         
@@ -53,10 +197,16 @@ def recognize_faces(file, save_result=True, method='hog', use_cnn_model=False):
         if not face_locations and method != 'hog':
             current_app.logger.info(f"Aucun visage détecté avec la méthode {method}, essai avec HOG")
             feature_extractor.set_method(FeatureExtractionMethod.HOG)
-            face_locations = feature_extractor.detect_faces(image)
+            if fallback is not None:
+                face_locations = fallback.result()
+            else:
+                face_locations = feature_extractor.detect_faces(image)
+        elif fallback is not None:
+            # Résultat inutile: l'abandonner s'il n'a pas encore démarré
+            fallback.cancel()
         
         # Obtenir les données des visages connus (pour la méthode standard)
-        known_face_encodings, known_face_names = get_known_faces()
+        known_face_encodings, known_face_names, index = get_gallery()
         
         # Extraire les caractéristiques faciales
         # (sauf si on utilise le modèle CNN qui a sa propre méthode)
@@ -69,10 +219,20 @@ def recognize_faces(file, save_result=True, method='hog', use_cnn_model=False):
         results = []
         output_filename = None
         
-        # Si des visages sont détectés et que l'enregistrement est activé
-        if face_locations and save_result:
-            # Convertir l'image pour dessiner dessus
-            image_cv = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+        # Comparer tous les visages de l'image à la galerie en une seule passe
+        best_indices, best_distances = None, None
+        if not use_cnn_model and len(known_face_names) > 0 and len(face_encodings) > 0:
+            quantized = None
+            if index is None and current_app.config['QUANTIZE_ENCODINGS'] \
+                    and len(known_face_names) > current_app.config['INT8_SCAN_THRESHOLD']:
+                quantized = get_quantized_gallery(known_face_encodings)
+            best_indices, best_distances = _best_matches(
+                face_encodings, known_face_encodings, index,
+                current_app.config['MATCH_RERANK_K'], get_squared_norms(known_face_encodings), quantized
+            )
+        
+        # Dessiner sur l'image BGR décodée (aucune conversion supplémentaire)
+        image_cv = image_bgr if save_result else None
         
         # Traiter chaque visage trouvé
         for i, (face_location, face_encoding) in enumerate(zip(face_locations, face_encodings)):
@@ -88,16 +248,13 @@ def recognize_faces(file, save_result=True, method='hog', use_cnn_model=False):
                 face_img = image[top:bottom, left:right]
                 
                 # Prédire avec le modèle CNN
-                name, confidence = cnn_model.predict(face_img)
+                name, confidence = cnn_model.predict(face_img, is_bgr=False)
                 
             # Sinon, utiliser la méthode standard
-            elif known_face_encodings:
-                # Calculer les distances aux visages connus
-                face_distances = face_recognition.face_distance(known_face_encodings, face_encoding)
-                
-                # Trouver le meilleur match
-                best_match_index = np.argmin(face_distances)
-                confidence = 1.0 - face_distances[best_match_index]
+            elif best_indices is not None:
+                # Meilleur match calculé pour tous les visages avant la boucle
+                best_match_index = int(best_indices[i])
+                confidence = 1.0 - float(best_distances[i])
                 
                 # Vérifier si le match est suffisamment bon selon le seuil de confiance
                 threshold = current_app.config['FACE_RECOGNITION_THRESHOLD']
@@ -130,8 +287,8 @@ def recognize_faces(file, save_result=True, method='hog', use_cnn_model=False):
         
         # Sauvegarder l'image avec les annotations si demandé
         if save_result and face_locations:
-            output_filename = f"result_{filename}"
-            output_path = os.path.join(upload_folder, output_filename)
+            output_filename = f"result_{secure_filename(file.filename)}"
+            output_path = os.path.join(current_app.config['UPLOAD_FOLDER'], output_filename)
             cv2.imwrite(output_path, image_cv)
         
         # Préparer la réponse
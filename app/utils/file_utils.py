@@ -10,5 +10,30 @@ def allowed_file(filename):
     Returns:
         Boolean: True si l'extension est autorisée, False sinon
     """
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
\ No newline at end of file
+    _, sep, extension = filename.rpartition('.')
+    return bool(sep) and extension.lower() in current_app.config['_ALLOWED_EXT_SET']
+
+# Signatures (magic numbers) des formats d'image acceptés
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+)
+
+def sniff(stream):
+    """
+    Identifier le format d'une image à partir de ses premiers octets
+    
+    Args:
+        stream: Flux binaire positionné au début du fichier
+        
+    Returns:
+        str: Format détecté ('jpeg', 'png') ou None si non reconnu
+    """
+    position = stream.tell()
+    header = stream.read(12)
+    stream.seek(position)
+    
+    for signature, image_format in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return image_format
+    return None
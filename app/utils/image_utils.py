@@ -14,8 +14,17 @@ def resize_image(image_data, max_size=1024):
     Returns:
         bytes: Données de l'image redimensionnée au format JPEG
     """
-    image = Image.open(io.BytesIO(image_data))
-    width, height = image.size
+    # Décodage, redimensionnement et encodage OpenCV (libjpeg-turbo, SIMD)
+    # L'orientation EXIF est ignorée, comme avec PIL
+    image = cv2.imdecode(
+        np.frombuffer(image_data, np.uint8),
+        cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION
+    )
+    if image is None:
+        # Format non pris en charge par OpenCV: repli sur PIL
+        return _resize_image_pil(image_data, max_size)
+    
+    height, width = image.shape[:2]
     
     # Si l'image est déjà assez petite, la retourner telle quelle
     if width <= max_size and height <= max_size:
@@ -26,35 +35,66 @@ def resize_image(image_data, max_size=1024):
     new_width = int(width * ratio)
     new_height = int(height * ratio)
     
-    # Redimensionner l'image
-    resized_image = image.resize((new_width, new_height), Image.LANCZOS)
+    # INTER_AREA: interpolation adaptée à la réduction
+    resized_image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_AREA)
+    
+    ok, output = cv2.imencode('.jpg', resized_image, [int(cv2.IMWRITE_JPEG_QUALITY), 85])
+    if not ok:
+        return _resize_image_pil(image_data, max_size)
+    
+    return output.tobytes()
+
+def _resize_image_pil(image_data, max_size):
+    """
+    Redimensionner une image avec PIL (formats non décodables par OpenCV)
+    
+    Args:
+        image_data: Données binaires de l'image
+        max_size: Taille maximale en pixels (largeur ou hauteur)
+        
+    Returns:
+        bytes: Données de l'image redimensionnée au format JPEG
+    """
+    image = Image.open(io.BytesIO(image_data))
+    width, height = image.size
+    
+    if width <= max_size and height <= max_size:
+        return image_data
+    
+    ratio = min(max_size / width, max_size / height)
+    resized_image = image.resize((int(width * ratio), int(height * ratio)), Image.LANCZOS)
     
-    # Convertir en bytes
     output = io.BytesIO()
-    resized_image.save(output, format='JPEG', quality=85)
+    resized_image.convert('RGB').save(output, format='JPEG', quality=85)
     
     return output.getvalue()
 
-def enhance_image_for_detection(image_array):
+def enhance_image_for_detection(image_array, return_rgb=False):
     """
     Améliore une image pour la détection faciale
     - Normalisation de la luminosité
     - Augmentation du contraste
     
     Args:
-        image_array: Tableau numpy de l'image
+        image_array: Tableau numpy de l'image (BGR ou déjà en niveaux de gris)
+        return_rgb: Retourner une vue à 3 canaux au lieu de l'image en niveaux de gris
         
     Returns:
-        numpy.ndarray: Image améliorée
+        numpy.ndarray: Image améliorée en niveaux de gris, ou vue (h, w, 3)
+        en lecture seule si return_rgb est vrai
     """
-    # Convertir en niveaux de gris
-    gray = cv2.cvtColor(image_array, cv2.COLOR_BGR2GRAY)
+    # Convertir en niveaux de gris si nécessaire
+    if image_array.ndim == 2:
+        gray = image_array
+    else:
+        gray = cv2.cvtColor(image_array, cv2.COLOR_BGR2GRAY)
     
     # Égalisation d'histogramme adaptative (CLAHE)
     clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
     enhanced = clahe.apply(gray)
     
-    # Reconvertir en RGB
-    enhanced_rgb = cv2.cvtColor(enhanced, cv2.COLOR_GRAY2RGB)
+    if not return_rgb:
+        return enhanced
     
-    return enhanced_rgb
\ No newline at end of file
+    # Vue à 3 canaux sans copie (les trois canaux partagent les mêmes données)
+    return np.broadcast_to(enhanced[..., None], enhanced.shape + (3,))
@@ -4,15 +4,589 @@ Client de test pour l'API de reconnaissance faciale.
 Permet d'interagir facilement avec l'API via la ligne de commande.
 """
 
-import requests
+# Modules lourds ou propres à une commande (requests, urllib3, tabulate, httpx, csv,
+# concurrent.futures...) importés à la première utilisation: --help et set-url démarrent
+# sans les charger
 import argparse
 import os
 import json
 import sys
-from tabulate import tabulate
+import time
+import random
+import threading
+import mimetypes
+import io
+import stat
+from functools import lru_cache
+from urllib.parse import urlsplit
+from collections import OrderedDict
+from operator import itemgetter
+
+try:
+    import orjson
+except ImportError:  # orjson est optionnel, repli sur json
+    orjson = None
 
 API_URL = "http://localhost:5000"
 
+# Dossier de configuration du client (URL de l'API, caches)
+CONFIG_DIR = os.path.expanduser('~/.config/facial-recognition-client')
+
+# Cache des résultats de reconnaissance (option --no-cache pour le désactiver)
+RECOGNITION_CACHE_FILE = os.path.join(CONFIG_DIR, 'recog_cache.json')
+RECOGNITION_CACHE_SIZE = 256
+# Durée de validité d'un résultat en cache (secondes): la clé inclut la dernière version
+# connue de la galerie (ETag de la liste), qui ne voit ni les modifications faites par
+# d'autres clients ni une image remplacée sous le même nom
+RECOGNITION_CACHE_TTL = 300
+USE_CACHE = True
+_recognition_cache = None
+
+# Dernière liste des visages connus et son ETag, revalidée par If-None-Match
+LIST_CACHE_FILE = os.path.join(CONFIG_DIR, 'list_cache.json')
+
+# Images envoyées par requête pour les commandes par lot, et requêtes simultanées
+BATCH_SIZE = 32
+BATCH_WORKERS = 8
+
+# Taille du pool de connexions de la session, qui borne le nombre de requêtes simultanées
+POOL_MAXSIZE = 50
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Au-delà de cette taille, les images envoyées sont projetées en mémoire (mmap) au lieu d'être copiées
+MMAP_THRESHOLD = 50 * 1024 * 1024
+
+# Nombre de tentatives par requête (option --retries)
+MAX_RETRIES = 3
+# Codes HTTP transitoires: surcharge ou indisponibilité momentanée du serveur
+RETRY_STATUSES = frozenset([429, 502, 503, 504])
+
+# Disjoncteur: après BREAKER_THRESHOLD échecs consécutifs en moins de BREAKER_WINDOW
+# secondes, les requêtes échouent immédiatement pendant BREAKER_COOLDOWN secondes
+# (état partagé entre les exécutions du client)
+BREAKER_FILE = os.path.join(CONFIG_DIR, 'breaker.json')
+BREAKER_THRESHOLD = 5
+BREAKER_WINDOW = 60
+BREAKER_COOLDOWN = 60
+# Seules ces réponses signalent une API indisponible; les autres (500 sur une image
+# invalide, 4xx...) prouvent que le serveur répond
+BREAKER_STATUSES = frozenset([502, 503, 504])
+_breaker = None
+_breaker_lock = threading.Lock()
+
+# Délais (connexion, lecture) en secondes; la lecture couvre l'entraînement du modèle CNN
+TIMEOUT = (3, 120)
+
+# Adresses IP enregistrées par set-url (hôte -> IP): évite une résolution DNS
+# par lancement du client; l'en-tête Host et le SNI gardent le nom d'hôte
+_PINNED_HOSTS = {}
+
+@lru_cache(maxsize=1)
+def _accept_encoding():
+    """En-tête Accept-Encoding: 'br' seulement si brotli peut décoder les réponses"""
+    import importlib.util
+    
+    # brotli est optionnel (utilisé par urllib3 et httpx pour décoder 'br'), repli sur gzip/deflate
+    if importlib.util.find_spec('brotli') is not None:
+        return 'gzip, deflate, br'
+    return 'gzip, deflate'
+
+@lru_cache(maxsize=1)
+def _get_session():
+    """
+    Créer la session partagée au premier appel: les connexions TCP (et TLS) sont
+    réutilisées d'un appel à l'autre. Les nouvelles tentatives sont gérées par
+    _request_with_retry (pas par l'adaptateur, pour ne pas multiplier les essais)
+    
+    Returns:
+        requests.Session
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    import urllib3.util.connection as urllib3_connection
+    
+    create_connection = urllib3_connection.create_connection
+    
+    def pinned_create_connection(address, *args, **kwargs):
+        # Ouvrir le socket vers l'IP enregistrée de l'hôte, sinon résoudre normalement
+        host, port = address
+        ip = _PINNED_HOSTS.get(host)
+        if ip is not None:
+            try:
+                return create_connection((ip, port), *args, **kwargs)
+            except OSError:
+                # Adresse périmée: oublier l'épinglage et passer par le DNS
+                _PINNED_HOSTS.pop(host, None)
+        return create_connection(address, *args, **kwargs)
+    
+    urllib3_connection.create_connection = pinned_create_connection
+    
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    # Réponses compressées si le serveur le permet (longues listes de visages);
+    # requests les décode de façon transparente
+    session.headers.update({'Accept-Encoding': _accept_encoding(), 'Connection': 'keep-alive'})
+    return session
+
+def _session_created():
+    """Indiquer si la session partagée existe déjà"""
+    return _get_session.cache_info().currsize > 0
+
+def _retry_policy(total):
+    """
+    Politique de nouvelles tentatives commune à toutes les requêtes: seules les
+    réponses où réessayer peut aider (429, 502, 503, 504) sont rejouées, en
+    respectant l'en-tête Retry-After. Construite à chaque requête pour suivre
+    --retries, qui peut changer d'une commande à l'autre en mode --daemon
+    
+    Args:
+        total: Nombre de nouvelles tentatives autorisées
+    
+    Returns:
+        urllib3.util.retry.Retry
+    """
+    from urllib3.util.retry import Retry
+    
+    return Retry(
+        total=total,
+        backoff_factor=1.0,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET', 'POST', 'DELETE']),
+        respect_retry_after_header=True,
+    )
+
+@lru_cache(maxsize=1)
+def _multipart_encoder():
+    """Classe MultipartEncoder de requests-toolbelt, ou None"""
+    try:
+        from requests_toolbelt.multipart.encoder import MultipartEncoder
+    except ImportError:  # requests-toolbelt est optionnel, repli sur files= (corps en mémoire)
+        return None
+    return MultipartEncoder
+
+@lru_cache(maxsize=1)
+def _get_httpx():
+    """Module httpx, ou None"""
+    try:
+        import httpx
+    except ImportError:  # httpx est optionnel, repli sur requests (mode --async indisponible)
+        return None
+    return httpx
+
+def _apply_url(url):
+    """
+    Changer l'URL de l'API utilisée par toutes les fonctions du module
+    
+    Args:
+        url: Nouvelle URL (ex: http://localhost:5000)
+    """
+    global API_URL
+    
+    new_url = url.rstrip('/')
+    if new_url != API_URL and _session_created():
+        # Les connexions vers l'ancien hôte ne serviront plus
+        for adapter in _get_session().adapters.values():
+            adapter.poolmanager.clear()
+    API_URL = new_url
+
+def _resolve_host(url):
+    """
+    Résoudre l'hôte d'une URL
+    
+    Args:
+        url: URL de l'API
+        
+    Returns:
+        Adresse IP, ou None si la résolution échoue
+    """
+    import socket
+    
+    try:
+        return socket.gethostbyname(urlsplit(url).hostname)
+    except (socket.error, TypeError, UnicodeError):
+        return None
+
+def _pin_host(url, ip):
+    """Utiliser ip pour toutes les connexions vers l'hôte de url"""
+    host = urlsplit(url).hostname
+    if host and ip:
+        _PINNED_HOSTS[host] = ip
+
+def close_session():
+    """Fermer les connexions ouvertes par la session partagée"""
+    if _session_created():
+        _get_session().close()
+
+def _loads(data):
+    """Décoder du JSON (bytes ou str) avec orjson s'il est installé"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _json(response):
+    """Décoder le corps JSON d'une réponse directement depuis ses octets"""
+    return _loads(response.content)
+
+class ApiUnreachableError(ConnectionError):
+    """API injoignable après toutes les tentatives"""
+
+class UnrecoverableError(Exception):
+    """Erreur qu'une nouvelle tentative ne corrigerait pas (URL invalide, certificat TLS...)"""
+
+class CircuitOpenError(ApiUnreachableError):
+    """Disjoncteur ouvert: la requête n'a pas été envoyée"""
+
+def _load_breaker():
+    """Charger l'état du disjoncteur pour l'URL courante (une fois par exécution)"""
+    global _breaker
+    
+    if _breaker is None or _breaker.get('api_url') != API_URL:
+        state = {}
+        try:
+            with open(BREAKER_FILE, 'rb') as f:
+                state = _loads(f.read())
+        except (OSError, ValueError):
+            pass
+        if state.get('api_url') != API_URL:
+            state = {'api_url': API_URL, 'failures': 0, 'first_failure': None, 'opened_at': None}
+        _breaker = state
+    return _breaker
+
+def _save_breaker():
+    """Sauvegarder l'état du disjoncteur"""
+    try:
+        os.makedirs(CONFIG_DIR, exist_ok=True)
+        tmp_file = BREAKER_FILE + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(_breaker, f)
+        os.replace(tmp_file, BREAKER_FILE)
+    except OSError:
+        pass
+
+def _breaker_before_request():
+    """
+    Autoriser ou refuser une requête selon l'état du disjoncteur
+    
+    Returns:
+        bool: True si la requête est la sonde unique de l'état semi-ouvert
+    
+    Raises:
+        CircuitOpenError: Si le disjoncteur est ouvert
+    """
+    with _breaker_lock:
+        state = _load_breaker()
+        if state['opened_at'] is None:
+            return False
+        
+        remaining = BREAKER_COOLDOWN - (time.time() - state['opened_at'])
+        if remaining > 0:
+            raise CircuitOpenError(
+                f"API temporairement injoignable ({API_URL}); réessayez dans {int(remaining) + 1}s"
+            )
+        
+        # Semi-ouvert: une seule sonde; le délai repart pour les autres requêtes
+        state['opened_at'] = time.time()
+        _save_breaker()
+        return True
+
+def _breaker_after_request(success):
+    """
+    Mettre à jour le disjoncteur après une requête
+    
+    Args:
+        success: L'API a répondu (code hors de BREAKER_STATUSES)
+    """
+    with _breaker_lock:
+        state = _load_breaker()
+        now = time.time()
+        
+        if success:
+            if state['failures'] or state['opened_at'] is not None:
+                state.update(failures=0, first_failure=None, opened_at=None)
+                _save_breaker()
+            return
+        
+        if state['opened_at'] is not None:
+            # Sonde en échec: rester ouvert, avec un nouveau délai
+            state['opened_at'] = now
+        else:
+            if state['first_failure'] is None or now - state['first_failure'] > BREAKER_WINDOW:
+                state.update(failures=0, first_failure=now)
+            state['failures'] += 1
+            if state['failures'] >= BREAKER_THRESHOLD:
+                state['opened_at'] = now
+        _save_breaker()
+
+class _RetryRun:
+    """
+    Déroulement des tentatives d'une requête, commun aux backends requests et httpx:
+    disjoncteur, classification des réponses (politique Retry) et délais d'attente
+    """
+    
+    def __init__(self, method, max_retries=None, base=1.0, cap=30.0, jitter=0.5):
+        """
+        Préparer les tentatives d'une requête
+        
+        Args:
+            method: Méthode HTTP ('GET', 'POST', ...)
+            max_retries: Nombre de tentatives (par défaut: MAX_RETRIES)
+            base: Délai de base en secondes
+            cap: Délai maximal en secondes
+            jitter: Part aléatoire ajoutée au délai (0.5 = jusqu'à +50%)
+        
+        Raises:
+            CircuitOpenError: Si le disjoncteur est ouvert
+        """
+        if max_retries is None:
+            max_retries = MAX_RETRIES
+        # La sonde du disjoncteur semi-ouvert ne fait qu'une tentative
+        if _breaker_before_request():
+            max_retries = 1
+        
+        self.method = method
+        self.attempts = max(1, max_retries)
+        self.policy = _retry_policy(self.attempts - 1)
+        self.base, self.cap, self.jitter = base, cap, jitter
+        # Causes des nouvelles tentatives, résumées à la fin
+        self.reasons = []
+    
+    def _delay(self, attempt, headers=None):
+        """Attente avant la tentative suivante: Retry-After du serveur, sinon backoff exponentiel"""
+        retry_after = headers.get('Retry-After') if headers is not None else None
+        if retry_after and self.policy.respect_retry_after_header:
+            # Délai imposé par le serveur (429, 503)
+            try:
+                return min(self.cap, self.policy.parse_retry_after(retry_after))
+            except Exception:
+                pass
+        # Attente exponentielle plafonnée, avec gigue pour étaler les reprises
+        return min(self.cap, self.base * 2 ** attempt) * (1 + random.random() * self.jitter)
+    
+    def after_error(self, attempt, error):
+        """
+        Classer une erreur transitoire (connexion, délai dépassé)
+        
+        Returns:
+            Délai avant la tentative suivante, ou None si c'était la dernière
+        """
+        if attempt == self.attempts - 1:
+            return None
+        self.reasons.append(type(error).__name__)
+        return self._delay(attempt)
+    
+    def after_response(self, attempt, status_code, headers):
+        """
+        Classer une réponse: seuls les codes transitoires sont rejoués
+        (400 image invalide, 404, 500... sont définitifs)
+        
+        Returns:
+            Délai avant la tentative suivante, ou None pour garder cette réponse
+        """
+        if attempt == self.attempts - 1 or \
+                not self.policy.is_retry(self.method, status_code, 'Retry-After' in headers):
+            return None
+        self.reasons.append(str(status_code))
+        return self._delay(attempt, headers)
+    
+    def finish(self, status_code=None):
+        """
+        Terminer la requête: résumer les tentatives et mettre à jour le disjoncteur
+        
+        Args:
+            status_code: Code de la dernière réponse, None si l'API est restée injoignable
+        """
+        _report_retries(self.reasons, status_code is not None and status_code < 400)
+        _breaker_after_request(status_code is not None and status_code not in BREAKER_STATUSES)
+
+def _unreachable_message():
+    """Message affiché quand l'API reste injoignable après toutes les tentatives"""
+    return (f"Impossible de se connecter à l'API à {API_URL}. Assurez-vous que l'API "
+            f"est en cours d'exécution ou utilisez 'set-url' pour changer l'URL.")
+
+def _request_with_retry(method, url, max_retries=None, base=1.0, cap=30.0, jitter=0.5, body=None, **kwargs):
+    """
+    Envoyer une requête HTTP avec nouvelles tentatives (backoff exponentiel + gigue)
+    
+    Args:
+        method: Méthode HTTP ('GET', 'POST', ...)
+        url: URL de la requête
+        max_retries: Nombre de tentatives (par défaut: MAX_RETRIES)
+        base: Délai de base en secondes
+        cap: Délai maximal en secondes
+        jitter: Part aléatoire ajoutée au délai (0.5 = jusqu'à +50%)
+        body: Fonction retournant les arguments du corps (data, files, headers),
+              rappelée à chaque tentative pour les corps consommés à l'envoi
+        **kwargs: Arguments transmis à requests.Session.request
+    
+    Returns:
+        requests.Response: Dernière réponse obtenue (les erreurs définitives sont retournées immédiatement)
+    
+    Raises:
+        UnrecoverableError: Si l'erreur ne peut pas disparaître en réessayant
+        CircuitOpenError: Si le disjoncteur est ouvert (aucune requête envoyée)
+        ApiUnreachableError: Si l'API est restée injoignable
+        requests.exceptions.RequestException: Si aucune tentative n'a abouti
+    """
+    import requests
+    
+    kwargs.setdefault('timeout', TIMEOUT)
+    run = _RetryRun(method, max_retries, base, cap, jitter)
+    session = _get_session()
+    response = None
+    
+    for attempt in range(run.attempts):
+        try:
+            request_kwargs = dict(kwargs, **body()) if body else kwargs
+            response = session.request(method, url, **request_kwargs)
+        except (requests.exceptions.SSLError, requests.exceptions.InvalidURL,
+                requests.exceptions.MissingSchema, requests.exceptions.InvalidSchema) as e:
+            raise UnrecoverableError(str(e)) from e
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            # Erreur transitoire: réessayer, puis propager à la dernière tentative
+            delay = run.after_error(attempt, e)
+            if delay is None:
+                run.finish(None)
+                if isinstance(e, requests.exceptions.ConnectionError):
+                    # Remplace la vérification préalable de l'API: même message, sans aller-retour
+                    raise ApiUnreachableError(_unreachable_message()) from e
+                raise
+            time.sleep(delay)
+            continue
+        
+        delay = run.after_response(attempt, response.status_code, response.headers)
+        if delay is None:
+            break
+        # Rendre la connexion au pool (réponses en flux)
+        response.close()
+        time.sleep(delay)
+    
+    run.finish(response.status_code)
+    return response
+
+def _report_retries(reasons, success):
+    """
+    Résumer les nouvelles tentatives d'une requête sur la sortie d'erreur
+    
+    Args:
+        reasons: Cause de chaque nouvelle tentative (code HTTP ou exception)
+        success: La dernière tentative a-t-elle abouti
+    """
+    if reasons:
+        outcome = 'succès' if success else 'échec'
+        print(f"↻ {len(reasons)} nouvelle(s) tentative(s) après {', '.join(reasons)}; {outcome}",
+              file=sys.stderr)
+
+def _read_image(image_path):
+    """
+    Charger une image une seule fois pour toutes les tentatives d'envoi
+    
+    Args:
+        image_path: Chemin de l'image
+    
+    Returns:
+        Objet fichier en mémoire (BytesIO), ou projeté (mmap) au-delà de MMAP_THRESHOLD
+    """
+    with open(image_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size > MMAP_THRESHOLD:
+            import mmap
+            # Très gros fichier: pages lues à la demande plutôt qu'une copie en mémoire
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return io.BytesIO(f.read())
+
+def _upload(url, image_paths, fields, image_files=None):
+    """
+    Envoyer une ou plusieurs images en multipart; chaque image est lue une seule
+    fois et rembobinée à chaque tentative
+    
+    Args:
+        url: URL de l'endpoint
+        image_paths: Chemin d'une image, ou liste de chemins (champ 'file' répété)
+        fields: Champs de formulaire supplémentaires (dict ou liste de tuples)
+        image_files: Contenus déjà chargés par _read_image, dans l'ordre des chemins
+                     (fermés par l'appelant)
+    
+    Returns:
+        requests.Response
+    """
+    if isinstance(image_paths, str):
+        image_paths = [image_paths]
+    fields = list(fields.items()) if isinstance(fields, dict) else list(fields)
+    
+    # Type MIME réel (PNG, JPEG...) plutôt qu'image/jpeg systématique
+    images = []
+    opened = []
+    try:
+        for i, image_path in enumerate(image_paths):
+            mime_type = mimetypes.guess_type(image_path)[0] or 'application/octet-stream'
+            if image_files is not None:
+                image_file = image_files[i]
+            else:
+                image_file = _read_image(image_path)
+                opened.append(image_file)
+            images.append((os.path.basename(image_path), image_file, mime_type))
+        
+        MultipartEncoder = _multipart_encoder()
+        
+        def body():
+            for _, image_file, _ in images:
+                image_file.seek(0)
+            parts = [('file', image) for image in images]
+            if MultipartEncoder is None:
+                return {'files': parts, 'data': fields}
+            # Corps produit au fil de l'envoi, avec Content-Length, sans copie en mémoire
+            encoder = MultipartEncoder(fields=fields + parts)
+            return {'data': encoder, 'headers': {'Content-Type': encoder.content_type}}
+        
+        return _request_with_retry('POST', url, body=body)
+    finally:
+        for image_file in opened:
+            image_file.close()
+
+def _list_images(dir_path):
+    """
+    Lister les images d'un dossier, triées par nom
+    
+    Args:
+        dir_path: Dossier à parcourir
+    
+    Returns:
+        list: Chemins des images
+    """
+    # scandir: type du fichier lu avec le nom, stat mis en cache par l'entrée
+    with os.scandir(dir_path) as entries:
+        return sorted(
+            entry.path for entry in entries
+            if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file() and entry.stat().st_size > 0
+        )
+
+def _check_image(image_path):
+    """
+    Vérifier une image avant tout envoi (un seul appel système)
+    
+    Args:
+        image_path: Chemin de l'image
+    
+    Returns:
+        str: Message d'erreur, ou None si l'image peut être envoyée
+    """
+    try:
+        st = os.stat(image_path)
+    except OSError:
+        return f"Le fichier {image_path} n'existe pas"
+    if not stat.S_ISREG(st.st_mode):
+        return f"{image_path} n'est pas un fichier"
+    if st.st_size == 0:
+        return f"Le fichier {image_path} est vide"
+    if not image_path.lower().endswith(IMAGE_EXTENSIONS):
+        return f"Format non pris en charge: {image_path} (formats acceptés: {', '.join(IMAGE_EXTENSIONS)})"
+    return None
+
+def _chunks(items, size):
+    """Découper une liste en lots de taille size"""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
 def register_face(image_path, name, verbose=True):
     """
     Enregistrer un nouveau visage dans la base de données
@@ -25,37 +599,176 @@ def register_face(image_path, name, verbose=True):
     Returns:
         bool: Succès ou échec
     """
-    if not os.path.exists(image_path):
-        print(f"Erreur: Le fichier {image_path} n'existe pas")
+    error = _check_image(image_path)
+    if error:
+        print(f"Erreur: {error}")
         return False
     
     url = f"{API_URL}/register_face"
     
     try:
-        with open(image_path, 'rb') as image_file:
-            files = {'file': (os.path.basename(image_path), image_file, 'image/jpeg')}
-            data = {'name': name}
-            
-            response = requests.post(url, files=files, data=data)
-            
-            if response.status_code == 200:
-                result = response.json()
-                if verbose:
-                    if result.get('success'):
-                        print(f"✅ {result.get('message')}")
-                    else:
-                        print(f"❌ {result.get('error')}")
-                return result.get('success', False)
-            else:
-                if verbose:
-                    print(f"❌ Erreur HTTP {response.status_code}: {response.text}")
-                return False
+        response = _upload(url, image_path, {'name': name})
+        
+        if response.status_code == 200:
+            result = _json(response)
+            if verbose:
+                if result.get('success'):
+                    print(f"✅ {result.get('message')}")
+                else:
+                    print(f"❌ {result.get('error')}")
+            if result.get('success'):
+                # Les reconnaissances en cache ne reflètent plus la galerie
+                clear_recognition_cache()
+            return result.get('success', False)
+        else:
+            if verbose:
+                print(f"❌ Erreur HTTP {response.status_code}: {response.text}")
+            return False
     except Exception as e:
         if verbose:
             print(f"❌ Erreur lors de la connexion à l'API: {str(e)}")
         return False
 
-def recognize_face(image_path, method=None, use_cnn_model=False, verbose=True):
+def _load_recognition_cache():
+    """Charger le cache des reconnaissances depuis le disque (une fois par exécution)"""
+    global _recognition_cache
+    
+    if _recognition_cache is None:
+        _recognition_cache = OrderedDict()
+        try:
+            with open(RECOGNITION_CACHE_FILE, 'rb') as f:
+                _recognition_cache.update(_loads(f.read()))
+        except (OSError, ValueError):
+            pass
+    return _recognition_cache
+
+def _save_recognition_cache():
+    """Sauvegarder le cache des reconnaissances"""
+    if _recognition_cache is None:
+        return
+    try:
+        os.makedirs(CONFIG_DIR, exist_ok=True)
+        tmp_file = RECOGNITION_CACHE_FILE + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(_recognition_cache, f)
+        os.replace(tmp_file, RECOGNITION_CACHE_FILE)
+    except OSError as e:
+        print(f"⚠️ Erreur lors de la sauvegarde du cache: {str(e)}")
+
+def clear_recognition_cache():
+    """Vider le cache des reconnaissances (la galerie du serveur a changé)"""
+    global _recognition_cache
+    
+    _recognition_cache = OrderedDict()
+    if os.path.exists(RECOGNITION_CACHE_FILE):
+        _save_recognition_cache()
+
+def _recognition_key(image, method, use_cnn_model, gallery):
+    """
+    Clé de cache: contenu de l'image, paramètres de reconnaissance, serveur et galerie
+    
+    Args:
+        image: Contenu de l'image chargé par _read_image (BytesIO ou mmap)
+        method: Méthode d'extraction
+        use_cnn_model: Utilisation du modèle CNN personnalisé
+        gallery: Version de la galerie (ETag de la dernière liste, '' si inconnue)
+    
+    Returns:
+        str: Clé hexadécimale
+    """
+    import hashlib
+    
+    buffer = image.getbuffer() if isinstance(image, io.BytesIO) else image
+    digest = hashlib.blake2b(buffer, digest_size=16)
+    if isinstance(image, io.BytesIO):
+        buffer.release()
+    return f"{digest.hexdigest()}:{method or 'hog'}:{int(bool(use_cnn_model))}:{API_URL}:{gallery}"
+
+# Extraction des champs d'un résultat en C plutôt que par des .get() successifs
+_get_location = itemgetter('left', 'top', 'right', 'bottom')
+
+def _print_recognition(result, image_path, method, use_cnn_model, quiet=False):
+    """Afficher le résultat d'une reconnaissance (une seule ligne si quiet)"""
+    if not result.get('success'):
+        print(f"❌ {result.get('error')}")
+        return
+    
+    if quiet:
+        names = ', '.join(face['name'] for face in result.get('results', []))
+        print(f"{os.path.basename(image_path)}: {names or '-'}")
+        return
+    
+    print(f"Analyse de l'image: {os.path.basename(image_path)}")
+    print(f"Méthode: {method or 'hog'}{' (Modèle CNN)' if use_cnn_model else ''}")
+    print(f"Visages détectés: {result.get('faces_detected', 0)}\n")
+    
+    if result.get('faces_detected', 0) > 0:
+        # Préparer toutes les lignes du tableau en une compréhension
+        table_data = [
+            [
+                face['id'],
+                face.get('name', 'Inconnu'),
+                f"{face['confidence'] * 100:.2f}%",
+                "({},{})-({},{})".format(*_get_location(face['location']))
+            ]
+            for face in result['results']
+        ]
+        
+        # Afficher les résultats dans un tableau
+        from tabulate import tabulate
+        print(tabulate(
+            table_data, 
+            headers=['ID', 'Personne', 'Confiance', 'Position'], 
+            tablefmt='pretty'
+        ))
+        
+        if result.get('output_image'):
+            print(f"\nImage annotée disponible à: {API_URL}/get_image/{result.get('output_image')}")
+    else:
+        print("Aucun visage détecté dans l'image.")
+
+def download_image(filename, out_path=None, verbose=True):
+    """
+    Télécharger une image traitée par l'API, par blocs de 64 Ko
+    (mémoire constante même pour les grandes images annotées)
+    
+    Args:
+        filename: Nom de l'image sur le serveur (champ output_image)
+        out_path: Fichier de destination (défaut: filename dans le dossier courant)
+        verbose: Afficher le résultat
+    
+    Returns:
+        str: Chemin du fichier écrit ou None
+    """
+    if not out_path:
+        out_path = os.path.basename(filename)
+    elif os.path.isdir(out_path):
+        out_path = os.path.join(out_path, os.path.basename(filename))
+    
+    url = f"{API_URL}/get_image/{filename}"
+    
+    try:
+        # Le contexte rend la connexion au pool même si l'écriture échoue
+        with _request_with_retry('GET', url, stream=True) as response:
+            if response.status_code != 200:
+                if verbose:
+                    print(f"❌ Erreur HTTP {response.status_code}: {response.text}")
+                return None
+            
+            with open(out_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    f.write(chunk)
+        
+        if verbose:
+            print(f"✅ Image annotée enregistrée dans {out_path}")
+        return out_path
+    except Exception as e:
+        if verbose:
+            print(f"❌ Erreur lors du téléchargement de l'image: {str(e)}")
+        return None
+
+def recognize_face(image_path, method=None, use_cnn_model=False, verbose=True, use_cache=None, quiet=False,
+                   download=None):
     """
     Reconnaître les visages dans une image
     
@@ -64,100 +777,419 @@ def recognize_face(image_path, method=None, use_cnn_model=False, verbose=True):
         method: Méthode d'extraction de caractéristiques ('hog', 'cnn', 'custom_hog', 'lbp')
         use_cnn_model: Utiliser le modèle CNN personnalisé
         verbose: Afficher les détails de la réponse
+        use_cache: Réutiliser un résultat déjà obtenu pour la même image (par défaut: USE_CACHE)
+        quiet: Afficher une ligne de résumé au lieu du tableau
+        download: Télécharger l'image annotée vers ce chemin ('' pour le nom du serveur,
+                  None pour ne pas télécharger)
     
     Returns:
         dict: Résultats de la reconnaissance ou None
     """
-    if not os.path.exists(image_path):
-        print(f"Erreur: Le fichier {image_path} n'existe pas")
+    error = _check_image(image_path)
+    if error:
+        print(f"Erreur: {error}")
         return None
     
+    if use_cache is None:
+        use_cache = USE_CACHE
+    
     url = f"{API_URL}/recognize"
     
+    image = None
     try:
-        with open(image_path, 'rb') as image_file:
-            files = {'file': (os.path.basename(image_path), image_file, 'image/jpeg')}
-            data = {}
+        # Lue une seule fois: sert à la clé de cache et à toutes les tentatives d'envoi
+        image = _read_image(image_path)
+        
+        # Image déjà analysée avec les mêmes paramètres et la même galerie: ni envoi
+        # ni inférence. La version est l'ETag déjà enregistré par la dernière liste,
+        # sans requête supplémentaire (register/delete vident le cache localement)
+        key = None
+        if use_cache:
+            listed = _load_list_cache()
+            key = _recognition_key(image, method, use_cnn_model, listed['etag'] if listed else '')
+            cache = _load_recognition_cache()
+            entry = cache.get(key)
+            if entry and time.time() - entry['cached_at'] < RECOGNITION_CACHE_TTL:
+                cache.move_to_end(key)
+                result = entry['result']
+                if verbose:
+                    _print_recognition(result, image_path, method, use_cnn_model, quiet)
+                if download is not None and result.get('output_image'):
+                    download_image(result['output_image'], download, verbose)
+                return result
+        
+        data = {}
+        
+        if method:
+            data['method'] = method
+        
+        if use_cnn_model:
+            data['use_cnn_model'] = 'true'
+        
+        response = _upload(url, image_path, data, image_files=[image])
+        
+        if response.status_code == 200:
+            result = _json(response)
             
-            if method:
-                data['method'] = method
+            if verbose:
+                _print_recognition(result, image_path, method, use_cnn_model, quiet)
             
-            if use_cnn_model:
-                data['use_cnn_model'] = 'true'
+            if key and result.get('success'):
+                cache[key] = {'cached_at': time.time(), 'result': result}
+                cache.move_to_end(key)
+                while len(cache) > RECOGNITION_CACHE_SIZE:
+                    cache.popitem(last=False)
+                _save_recognition_cache()
             
-            response = requests.post(url, files=files, data=data)
+            # Même session: la connexion de l'envoi est réutilisée pour le téléchargement
+            if download is not None and result.get('output_image'):
+                download_image(result['output_image'], download, verbose)
             
-            if response.status_code == 200:
-                result = response.json()
-                
-                if verbose:
-                    if result.get('success'):
-                        print(f"Analyse de l'image: {os.path.basename(image_path)}")
-                        print(f"Méthode: {method or 'hog'}{' (Modèle CNN)' if use_cnn_model else ''}")
-                        print(f"Visages détectés: {result.get('faces_detected', 0)}\n")
-                        
-                        if result.get('faces_detected', 0) > 0:
-                            # Préparer les données pour le tableau
-                            table_data = []
-                            for face in result.get('results', []):
-                                confidence = face.get('confidence', 0) * 100
-                                location = face.get('location', {})
-                                coords = f"({location.get('left')},{location.get('top')})-({location.get('right')},{location.get('bottom')})"
-                                table_data.append([
-                                    face.get('id', ''),
-                                    face.get('name', 'Inconnu'),
-                                    f"{confidence:.2f}%",
-                                    coords
-                                ])
-                            
-                            # Afficher les résultats dans un tableau
-                            print(tabulate(
-                                table_data, 
-                                headers=['ID', 'Personne', 'Confiance', 'Position'], 
-                                tablefmt='pretty'
-                            ))
-                            
-                            if result.get('output_image'):
-                                print(f"\nImage annotée disponible à: {API_URL}/get_image/{result.get('output_image')}")
-                        else:
-                            print("Aucun visage détecté dans l'image.")
-                    else:
-                        print(f"❌ {result.get('error')}")
-                
-                return result
-            else:
-                if verbose:
-                    print(f"❌ Erreur HTTP {response.status_code}: {response.text}")
-                return None
+            return result
+        else:
+            if verbose:
+                print(f"❌ Erreur HTTP {response.status_code}: {response.text}")
+            return None
     except Exception as e:
         if verbose:
             print(f"❌ Erreur lors de la connexion à l'API: {str(e)}")
         return None
+    finally:
+        if image is not None:
+            image.close()
+
+def register_batch(dir_path, names_csv=None, verbose=True):
+    """
+    Enregistrer toutes les images d'un dossier, par lots de BATCH_SIZE images par requête
+    
+    Args:
+        dir_path: Dossier contenant les images
+        names_csv: Fichier CSV optionnel 'fichier,nom' (par défaut: nom du fichier sans extension)
+        verbose: Afficher les détails de la réponse
+    
+    Returns:
+        int: Nombre de visages enregistrés
+    """
+    if not os.path.isdir(dir_path):
+        print(f"Erreur: Le dossier {dir_path} n'existe pas")
+        return 0
+    
+    names = {}
+    if names_csv:
+        import csv
+        with open(names_csv, newline='') as f:
+            names = {row[0].strip(): row[1].strip() for row in csv.reader(f) if len(row) >= 2}
+    
+    pairs = [
+        (path, names.get(os.path.basename(path), os.path.splitext(os.path.basename(path))[0]))
+        for path in _list_images(dir_path)
+    ]
+    if not pairs:
+        print(f"Aucune image trouvée dans {dir_path}")
+        return 0
+    
+    url = f"{API_URL}/register_faces_batch"
+    
+    def send(chunk):
+        try:
+            response = _upload(url, [path for path, _ in chunk], [('name', name) for _, name in chunk])
+        except Exception as e:
+            return [{'name': name, 'success': False, 'error': str(e)} for _, name in chunk]
+        
+        if response.status_code == 404:
+            # Serveur sans endpoint par lot: une requête par image sur la session partagée
+            return [
+                {'name': name, 'success': register_face(path, name, verbose=False)}
+                for path, name in chunk
+            ]
+        if response.status_code != 200:
+            error = f"Erreur HTTP {response.status_code}"
+            return [{'name': name, 'success': False, 'error': error} for _, name in chunk]
+        return _json(response).get('results', [])
+    
+    from concurrent.futures import ThreadPoolExecutor
+    
+    # Lots envoyés en parallèle: les connexions du pool sont réutilisées
+    with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as executor:
+        results = [result for chunk in executor.map(send, _chunks(pairs, BATCH_SIZE)) for result in chunk]
+    
+    registered = sum(1 for result in results if result.get('success'))
+    if registered:
+        clear_recognition_cache()
+    
+    if verbose:
+        from tabulate import tabulate
+        print(tabulate(
+            [[result.get('name'), '✅' if result.get('success') else f"❌ {result.get('error', '')}"]
+             for result in results],
+            headers=['Personne', 'Résultat'],
+            tablefmt='pretty'
+        ))
+        print(f"{registered}/{len(results)} visages enregistrés")
+    
+    return registered
+
+def _batch_errors(chunk, error):
+    """Résultat en échec pour chaque image d'un lot"""
+    return [{'filename': os.path.basename(path), 'success': False, 'error': error} for path in chunk]
+
+def _recognize_one_by_one(chunk):
+    """Serveur sans endpoint par lot: une requête par image"""
+    return [
+        dict(recognize_face(path, verbose=False, use_cache=False) or {'success': False},
+             filename=os.path.basename(path))
+        for path in chunk
+    ]
+
+async def _send_batches_async(url, chunks):
+    """
+    Envoyer les lots d'images en parallèle avec httpx (HTTP/2 si h2 est installé)
+    
+    Args:
+        url: URL de l'endpoint /recognize_batch
+        chunks: Listes de chemins d'images
+    
+    Returns:
+        list: Résultats de chaque lot, dans l'ordre des lots
+    """
+    import asyncio
+    import importlib.util
+    
+    httpx = _get_httpx()
+    # HTTP/2 (multiplexage sur une connexion TLS) nécessite le paquet h2
+    http2 = importlib.util.find_spec('h2') is not None
+    limits = httpx.Limits(max_connections=POOL_MAXSIZE, max_keepalive_connections=POOL_MAXSIZE)
+    timeout = httpx.Timeout(TIMEOUT[1], connect=TIMEOUT[0])
+    # Nouvelles tentatives gérées par _RetryRun, pas par le transport
+    transport = httpx.AsyncHTTPTransport(http2=http2, limits=limits)
+    semaphore = asyncio.Semaphore(BATCH_WORKERS)
+    
+    async with httpx.AsyncClient(transport=transport, timeout=timeout,
+                                 headers={'Accept-Encoding': _accept_encoding()}) as client:
+        async def post(images):
+            # Mêmes règles que _request_with_retry: disjoncteur, codes transitoires, Retry-After
+            run = _RetryRun('POST')
+            response = None
+            for attempt in range(run.attempts):
+                for _, (_, image_file, _) in images:
+                    image_file.seek(0)
+                try:
+                    response = await client.post(url, files=images)
+                except httpx.UnsupportedProtocol as e:
+                    raise UnrecoverableError(str(e)) from e
+                except httpx.TransportError as e:
+                    delay = run.after_error(attempt, e)
+                    if delay is None:
+                        run.finish(None)
+                        if isinstance(e, httpx.TimeoutException):
+                            raise
+                        raise ApiUnreachableError(_unreachable_message()) from e
+                    await asyncio.sleep(delay)
+                    continue
+                
+                delay = run.after_response(attempt, response.status_code, response.headers)
+                if delay is None:
+                    break
+                await asyncio.sleep(delay)
+            
+            run.finish(response.status_code)
+            return response
+        
+        async def send(chunk):
+            async with semaphore:
+                images = []
+                try:
+                    for path in chunk:
+                        mime_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+                        images.append(('file', (os.path.basename(path), _read_image(path), mime_type)))
+                    response = await post(images)
+                except (httpx.HTTPError, OSError, UnrecoverableError) as e:
+                    # ApiUnreachableError et CircuitOpenError sont des OSError
+                    return _batch_errors(chunk, str(e))
+                finally:
+                    for _, (_, image_file, _) in images:
+                        image_file.close()
+            
+            if response.status_code == 404:
+                return await asyncio.to_thread(_recognize_one_by_one, chunk)
+            if response.status_code != 200:
+                return _batch_errors(chunk, f"Erreur HTTP {response.status_code}")
+            return _loads(response.content).get('results', [])
+        
+        return await asyncio.gather(*(send(chunk) for chunk in chunks))
+
+def recognize_batch(dir_path, verbose=True, use_async=False):
+    """
+    Reconnaître les visages de toutes les images d'un dossier, par lots de BATCH_SIZE images
+    
+    Args:
+        dir_path: Dossier contenant les images
+        verbose: Afficher les détails de la réponse
+        use_async: Envoyer les lots avec httpx/asyncio au lieu du pool de threads
+    
+    Returns:
+        list: Résultats de la reconnaissance pour chaque image
+    """
+    if not os.path.isdir(dir_path):
+        print(f"Erreur: Le dossier {dir_path} n'existe pas")
+        return []
+    
+    paths = _list_images(dir_path)
+    if not paths:
+        print(f"Aucune image trouvée dans {dir_path}")
+        return []
+    
+    url = f"{API_URL}/recognize_batch"
+    chunks = list(_chunks(paths, BATCH_SIZE))
+    
+    if use_async and _get_httpx() is None:
+        print("⚠️ httpx n'est pas installé, envoi sans --async")
+        use_async = False
+    
+    if use_async:
+        import asyncio
+        results = [result for chunk in asyncio.run(_send_batches_async(url, chunks)) for result in chunk]
+    else:
+        def send(chunk):
+            try:
+                response = _upload(url, chunk, {})
+            except Exception as e:
+                return _batch_errors(chunk, str(e))
+            
+            if response.status_code == 404:
+                return _recognize_one_by_one(chunk)
+            if response.status_code != 200:
+                return _batch_errors(chunk, f"Erreur HTTP {response.status_code}")
+            return _json(response).get('results', [])
+        
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as executor:
+            results = [result for chunk in executor.map(send, chunks) for result in chunk]
+    
+    if verbose:
+        table_data = []
+        for result in results:
+            if result.get('success'):
+                names = ', '.join(face.get('name', 'Inconnu') for face in result.get('results', []))
+                table_data.append([result.get('filename'), result.get('faces_detected', 0), names or '-'])
+            else:
+                table_data.append([result.get('filename'), '-', f"❌ {result.get('error', '')}"])
+        from tabulate import tabulate
+        print(tabulate(table_data, headers=['Image', 'Visages', 'Personnes'], tablefmt='pretty'))
+    
+    return results
+
+def fetch_all_details(names, max_workers=16):
+    """
+    Récupérer en parallèle les informations de plusieurs visages
+    
+    Args:
+        names: Noms des personnes
+        max_workers: Requêtes simultanées (bornées par la taille du pool de connexions)
+    
+    Returns:
+        list: Informations de chaque visage, dans l'ordre des noms (None en cas d'erreur)
+    """
+    def fetch(name):
+        try:
+            response = _request_with_retry('GET', f"{API_URL}/face/{name}")
+            return _json(response) if response.status_code == 200 else None
+        except Exception:
+            return None
+    
+    workers = max(1, min(max_workers, POOL_MAXSIZE, len(names)))
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(fetch, names))
+
+def _load_list_cache():
+    """
+    Charger la liste des visages mise en cache pour l'URL courante
+    
+    Returns:
+        dict: {'api_url', 'etag', 'result'} ou None
+    """
+    try:
+        with open(LIST_CACHE_FILE, 'rb') as f:
+            cached = _loads(f.read())
+    except (OSError, ValueError):
+        return None
+    if cached.get('api_url') != API_URL or not cached.get('etag'):
+        return None
+    return cached
 
-def list_known_faces(verbose=True):
+def _save_list_cache(etag, result):
+    """
+    Sauvegarder la liste des visages et son ETag
+    
+    Args:
+        etag: En-tête ETag de la réponse
+        result: Corps JSON décodé de la réponse
+    """
+    try:
+        os.makedirs(CONFIG_DIR, exist_ok=True)
+        tmp_file = LIST_CACHE_FILE + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump({'api_url': API_URL, 'etag': etag, 'result': result}, f)
+        os.replace(tmp_file, LIST_CACHE_FILE)
+    except OSError as e:
+        print(f"⚠️ Erreur lors de la sauvegarde du cache: {str(e)}")
+
+def _fetch_known_faces(use_cache=True):
+    """
+    Récupérer la liste des visages, revalidée par If-None-Match
+    (liste inchangée: réponse 304 sans corps, ni téléchargement ni décodage)
+    
+    Args:
+        use_cache: Réutiliser la copie locale si le serveur la confirme
+    
+    Returns:
+        Tuple (réponse, corps JSON décodé ou None, ETag ou None)
+    """
+    cached = _load_list_cache() if use_cache else None
+    headers = {'If-None-Match': cached['etag']} if cached else {}
+    response = _request_with_retry('GET', f"{API_URL}/list_known_faces", headers=headers)
+    
+    if response.status_code == 304 and cached:
+        return response, cached['result'], cached['etag']
+    if response.status_code != 200:
+        return response, None, None
+    
+    result = _json(response)
+    etag = response.headers.get('ETag')
+    if etag and result.get('success'):
+        _save_list_cache(etag, result)
+    return response, result, etag
+
+def list_known_faces(verbose=True, details=False):
     """
     Lister tous les visages connus
     
     Args:
         verbose: Afficher les détails de la réponse
+        details: Récupérer et afficher les informations de chaque visage
     
     Returns:
         list: Liste des visages connus ou None
     """
-    url = f"{API_URL}/list_known_faces"
-    
     try:
-        response = requests.get(url)
+        response, result, _ = _fetch_known_faces(USE_CACHE)
         
-        if response.status_code == 200:
-            result = response.json()
-            
+        if result is not None:
             if verbose:
                 if result.get('success'):
                     faces = result.get('known_faces', [])
                     count = result.get('count', 0)
                     
-                    if count > 0:
+                    if count > 0 and details:
+                        print(f"Visages enregistrés ({count}):")
+                        table_data = [
+                            [i, face, info.get('filename', '-'), info.get('size', '-')] if info else [i, face, '-', '-']
+                            for i, (face, info) in enumerate(zip(faces, fetch_all_details(faces)), 1)
+                        ]
+                        from tabulate import tabulate
+                        print(tabulate(table_data, headers=['#', 'Personne', 'Fichier', 'Taille'], tablefmt='pretty'))
+                    elif count > 0:
                         print(f"Visages enregistrés ({count}):")
                         for i, face in enumerate(faces, 1):
                             print(f"  {i}. {face}")
@@ -190,10 +1222,10 @@ def delete_face(name, verbose=True):
     url = f"{API_URL}/delete_face/{name}"
     
     try:
-        response = requests.get(url)
+        response = _request_with_retry('GET', url)
         
         if response.status_code == 200:
-            result = response.json()
+            result = _json(response)
             
             if verbose:
                 if result.get('success'):
@@ -201,6 +1233,9 @@ def delete_face(name, verbose=True):
                 else:
                     print(f"❌ {result.get('error')}")
             
+            if result.get('success'):
+                clear_recognition_cache()
+            
             return result.get('success', False)
         else:
             if verbose:
@@ -222,18 +1257,22 @@ def check_api_status(verbose=True):
         bool: API en ligne ou non
     """
     try:
-        response = requests.get(API_URL)
+        response = _request_with_retry('GET', API_URL)
         
         if response.status_code == 200:
             if verbose:
-                result = response.json()
+                result = _json(response)
                 print(f"✅ API en ligne: {result.get('message')} (Status: {result.get('status')})")
             return True
         else:
             if verbose:
                 print(f"❌ L'API a répondu avec le code {response.status_code}")
             return False
-    except requests.exceptions.ConnectionError:
+    except CircuitOpenError as e:
+        if verbose:
+            print(f"❌ {str(e)}")
+        return False
+    except ApiUnreachableError:
         if verbose:
             print(f"❌ Impossible de se connecter à l'API à {API_URL}")
             print("   Assurez-vous que l'API est en cours d'exécution.")
@@ -243,9 +1282,23 @@ def check_api_status(verbose=True):
             print(f"❌ Erreur lors de la vérification de l'API: {str(e)}")
         return False
 
-def main():
-    """Fonction principale du client"""
+# Méthodes d'extraction acceptées par l'API
+METHODS = ('hog', 'cnn', 'custom_hog', 'lbp')
+
+def _build_parser():
+    """
+    Construire l'analyseur des arguments de la ligne de commande
+    
+    Returns:
+        argparse.ArgumentParser
+    """
     parser = argparse.ArgumentParser(description='Client pour l\'API de reconnaissance faciale')
+    parser.add_argument('--retries', type=int, default=MAX_RETRIES,
+                        help='Nombre de tentatives par requête (défaut: 3)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Ne pas réutiliser les résultats en cache (reconnaissances, liste des visages)')
+    parser.add_argument('--daemon', action='store_true',
+                        help='Lire les commandes sur l\'entrée standard (une par ligne) avec une seule session')
     
     # Commande principale
     subparsers = parser.add_subparsers(dest='command', help='Commande à exécuter')
@@ -261,13 +1314,29 @@ def main():
     # Commande pour reconnaître des visages
     recognize_parser = subparsers.add_parser('recognize', help='Reconnaître les visages dans une image')
     recognize_parser.add_argument('image', help='Chemin vers l\'image à analyser')
-    recognize_parser.add_argument('--method', choices=['hog', 'cnn', 'custom_hog', 'lbp'], 
+    recognize_parser.add_argument('--method', choices=METHODS, 
                                 help='Méthode d\'extraction de caractéristiques')
     recognize_parser.add_argument('--use-cnn-model', action='store_true', 
                                 help='Utiliser le modèle CNN personnalisé')
+    recognize_parser.add_argument('--quiet', action='store_true',
+                                help='Afficher seulement les noms reconnus, sans tableau')
+    recognize_parser.add_argument('--download', nargs='?', const='', metavar='PATH',
+                                help='Télécharger l\'image annotée (défaut: nom du fichier du serveur)')
+    
+    # Commandes par lot (une requête pour BATCH_SIZE images)
+    register_batch_parser = subparsers.add_parser('register-batch', help='Enregistrer toutes les images d\'un dossier')
+    register_batch_parser.add_argument('dir', help='Dossier contenant les images')
+    register_batch_parser.add_argument('--names', help='Fichier CSV \'fichier,nom\' (défaut: nom du fichier)')
+    
+    recognize_batch_parser = subparsers.add_parser('recognize-batch', help='Reconnaître les visages des images d\'un dossier')
+    recognize_batch_parser.add_argument('dir', help='Dossier contenant les images')
+    recognize_batch_parser.add_argument('--async', dest='use_async', action='store_true',
+                                        help='Envoyer les lots avec httpx (HTTP/2 si disponible)')
     
     # Commande pour lister les visages
-    subparsers.add_parser('list', help='Lister les visages enregistrés')
+    list_parser = subparsers.add_parser('list', help='Lister les visages enregistrés')
+    list_parser.add_argument('--details', action='store_true',
+                             help='Récupérer les informations de chaque visage (requêtes en parallèle)')
     
     # Commande pour supprimer un visage
     delete_parser = subparsers.add_parser('delete', help='Supprimer un visage')
@@ -277,57 +1346,114 @@ def main():
     url_parser = subparsers.add_parser('set-url', help='Définir l\'URL de l\'API')
     url_parser.add_argument('url', help='URL de l\'API (ex: http://localhost:5000)')
     
-    args = parser.parse_args()
+    return parser
+
+# Construit une seule fois par processus et réutilisé pour chaque commande du mode --daemon
+_PARSER = _build_parser()
+
+def main(argv=None):
+    """
+    Fonction principale du client
+    
+    Args:
+        argv: Arguments de la ligne de commande (défaut: sys.argv[1:])
+    """
+    args = _PARSER.parse_args(argv)
+    
+    if args.daemon:
+        run_daemon()
+    else:
+        run_command(args)
+
+def run_daemon():
+    """
+    Exécuter les commandes lues sur l'entrée standard, une par ligne
+    La session (DNS, TCP, TLS) est conservée pendant tout le lot
+    """
+    import shlex
+    
+    for line in sys.stdin:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line in ('quit', 'exit'):
+            break
+        
+        try:
+            args = _PARSER.parse_args(shlex.split(line))
+        except (SystemExit, ValueError):
+            # Ligne invalide: argparse a déjà affiché l'erreur
+            continue
+        
+        if args.daemon:
+            continue
+        run_command(args)
+        sys.stdout.flush()
+
+def run_command(args):
+    """
+    Exécuter une commande analysée
+    
+    Args:
+        args: Arguments analysés par _PARSER
+    """
+    global MAX_RETRIES, USE_CACHE
+    
+    MAX_RETRIES = args.retries
+    USE_CACHE = not args.no_cache
     
     # Si aucune commande n'est fournie, afficher l'aide
     if not args.command:
-        parser.print_help()
+        _PARSER.print_help()
         return
     
-    # Vérifier la connexion à l'API (sauf pour set-url)
-    if args.command != 'set-url' and args.command != 'status':
-        if not check_api_status(verbose=False):
-            print(f"❌ Impossible de se connecter à l'API à {API_URL}")
-            print("   Assurez-vous que l'API est en cours d'exécution ou utilisez 'set-url' pour changer l'URL.")
-            return
-    
     # Exécuter la commande appropriée
     if args.command == 'status':
         check_api_status()
     elif args.command == 'register':
         register_face(args.image, args.name)
     elif args.command == 'recognize':
-        recognize_face(args.image, args.method, args.use_cnn_model)
+        recognize_face(args.image, args.method, args.use_cnn_model, quiet=args.quiet,
+                       download=args.download)
+    elif args.command == 'register-batch':
+        register_batch(args.dir, args.names)
+    elif args.command == 'recognize-batch':
+        recognize_batch(args.dir, use_async=args.use_async)
     elif args.command == 'list':
-        list_known_faces()
+        list_known_faces(details=args.details)
     elif args.command == 'delete':
         delete_face(args.name)
     elif args.command == 'set-url':
         # Sauvegarder l'URL dans un fichier de configuration
-        config_dir = os.path.expanduser('~/.config/facial-recognition-client')
-        os.makedirs(config_dir, exist_ok=True)
-        config_file = os.path.join(config_dir, 'config.json')
+        os.makedirs(CONFIG_DIR, exist_ok=True)
+        config_file = os.path.join(CONFIG_DIR, 'config.json')
         
+        # Enregistrer aussi l'adresse IP pour éviter une résolution DNS par lancement
+        api_ip = _resolve_host(args.url)
         with open(config_file, 'w') as f:
-            json.dump({'api_url': args.url}, f)
+            json.dump({'api_url': args.url, 'api_ip': api_ip}, f)
         
         print(f"✅ URL de l'API définie à: {args.url}")
+        _pin_host(args.url, api_ip)
         
-        # Vérifier la connexion avec la nouvelle URL
-        # global API_URL
-        API_URL = args.url
+        # Vérifier la connexion avec la nouvelle URL (et non l'ancienne)
+        _apply_url(args.url)
         check_api_status()
 
 if __name__ == "__main__":
     # Charger l'URL de l'API depuis le fichier de configuration s'il existe
-    config_file = os.path.expanduser('~/.config/facial-recognition-client/config.json')
+    config_file = os.path.join(CONFIG_DIR, 'config.json')
     if os.path.exists(config_file):
         try:
-            with open(config_file, 'r') as f:
-                config = json.load(f)
+            with open(config_file, 'rb') as f:
+                config = _loads(f.read())
                 if 'api_url' in config:
-                    API_URL = config['api_url']
+                    _apply_url(config['api_url'])
+                    _pin_host(config['api_url'], config.get('api_ip'))
         except Exception as e:
             print(f"⚠️ Erreur lors du chargement de la configuration: {str(e)}")
     
-    main()
\ No newline at end of file
+    try:
+        main()
+    finally:
+        close_session()
\ No newline at end of file
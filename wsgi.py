@@ -0,0 +1,5 @@
+from app import create_app
+
+# Point d'entrée WSGI pour la production (gunicorn)
+# gunicorn -w $(nproc) --preload --worker-class gthread --threads 4 --timeout 120 wsgi:application
+application = create_app()